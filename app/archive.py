@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import wave
+import shutil
+import subprocess
+import meeting_index
+
+# --- Configuration ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+
+TRANSCRIPTS_DIR = os.path.join(PROJECT_ROOT, "transcripts")
+
+# Finished meetings keep their audio in one of these formats instead of as a WAV.
+# Opus at speech bitrates is about 1/20 the size of 16 kHz PCM; FLAC is lossless
+# and about half the size.
+ARCHIVE_FORMAT = "opus"
+OPUS_BITRATE = "24k"
+ARCHIVE_CODECS = {
+    "opus": (".opus", ["-c:a", "libopus", "-b:a", OPUS_BITRATE, "-application", "voip"]),
+    "flac": (".flac", ["-c:a", "flac", "-compression_level", "8"])
+}
+ARCHIVE_EXTENSIONS = {extension for extension, _ in ARCHIVE_CODECS.values()}
+STREAM_CHUNK_BYTES = 64 * 1024  # Bytes read from ffmpeg at a time when decoding for a download
+
+def is_archived(audio_filename):
+    return os.path.splitext(audio_filename)[1].lower() in ARCHIVE_EXTENSIONS
+
+def is_pcm_wav(filepath):
+    """Whether a file is an uncompressed WAV. Anything else is already compressed, and
+    re-encoding it would lose quality and may not even make it smaller."""
+    try:
+        with wave.open(filepath, 'rb') as wf:
+            return wf.getcomptype() == "NONE"
+    except (wave.Error, EOFError, OSError):
+        return False
+
+def archive_audio(meeting_id, meeting_path, audio_format=ARCHIVE_FORMAT):
+    """Transcodes a meeting's WAV into the archive format and removes the original.
+
+    Changes only audio_filename and archive (the sizes) in metadata.json, under its
+    lock, so edits made meanwhile are kept. Returns the updated metadata, or None if
+    the audio is not an uncompressed WAV (e.g. already archived or a compressed upload).
+    """
+    with open(os.path.join(meeting_path, 'metadata.json'), 'r') as f:
+        audio_filename = json.load(f)['audio_filename']
+    source_path = os.path.join(meeting_path, audio_filename)
+    if is_archived(audio_filename) or not is_pcm_wav(source_path):
+        return None
+
+    extension, codec_args = ARCHIVE_CODECS[audio_format]
+    archived_filename = os.path.splitext(audio_filename)[0] + extension
+    archived_path = os.path.join(meeting_path, archived_filename)
+
+    # Encode to a temporary name so a crash never leaves a truncated archive behind
+    tmp_path = f"{archived_path}.tmp"
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", source_path, "-vn", "-ac", "1"] + codec_args
+    cmd += ["-f", "ogg" if audio_format == "opus" else audio_format, tmp_path]
+    result = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(f"ffmpeg failed to archive {audio_filename}: {result.stderr.strip()}")
+    os.replace(tmp_path, archived_path)
+
+    metadata = meeting_index.update_metadata(meeting_id, meeting_path, {
+        "audio_filename": archived_filename,
+        "archive": {
+            "format": audio_format,
+            "original_filename": audio_filename,
+            "original_bytes": os.path.getsize(source_path),
+            "archived_bytes": os.path.getsize(archived_path)
+        }
+    })
+    os.remove(source_path)
+    return metadata
+
+def iter_decoded_wav(filepath):
+    """Decodes an archived file to a 16-bit WAV on the fly, yielding the bytes as ffmpeg produces them."""
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", filepath, "-f", "wav", "-acodec", "pcm_s16le", "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        for data in iter(lambda: proc.stdout.read(STREAM_CHUNK_BYTES), b""):
+            yield data
+    finally:
+        # The client may disconnect halfway through
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
+
+def storage_report():
+    """Returns how much space archiving has saved, plus the disk usage of the transcripts directory."""
+    meetings, _ = meeting_index.list_meetings()
+    archived = [meeting['archive'] for meeting in meetings if 'archive' in meeting]
+    original_bytes = sum(info['original_bytes'] for info in archived)
+    archived_bytes = sum(info['archived_bytes'] for info in archived)
+    disk = shutil.disk_usage(TRANSCRIPTS_DIR)
+    return {
+        "meetings": len(meetings),
+        "archived_meetings": len(archived),
+        "original_bytes": original_bytes,
+        "archived_bytes": archived_bytes,
+        "bytes_saved": original_bytes - archived_bytes,
+        "disk_total_bytes": disk.total,
+        "disk_free_bytes": disk.free
+    }
+
+def archive_existing(audio_format=ARCHIVE_FORMAT):
+    """Archives the audio of every meeting that has been processed but is still stored as a WAV."""
+    count = 0
+    meetings, _ = meeting_index.list_meetings()
+    for meeting in meetings:
+        if not meeting['pdf_exists'] or is_archived(meeting.get('audio_filename', '')):
+            continue
+        meeting_id = meeting['id']
+        meeting_path = os.path.join(TRANSCRIPTS_DIR, meeting_id)
+        if not os.path.exists(os.path.join(meeting_path, meeting['audio_filename'])):
+            continue
+        print(f"Archiving {meeting['audio_filename']} of meeting {meeting_id}...")
+        if archive_audio(meeting_id, meeting_path, audio_format) is None:
+            continue
+        count += 1
+    return count
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        print("Usage: python3 archive.py backfill")
+        sys.exit(1)
+    print(f"Archived {archive_existing()} meetings.")
+    print(json.dumps(storage_report(), indent=2))
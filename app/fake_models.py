@@ -0,0 +1,88 @@
+import json
+import zlib
+import speech
+
+# Stand-ins for the Vosk and ctransformers models with the same interface, for
+# running the worker, the model server and the benchmarks without the real models.
+# Output is deterministic and depends only on the input, so caches and
+# comparisons behave as they do with real models.
+
+WORD_SECONDS = 0.5       # One fake word per this much non-silent audio
+UTTERANCE_SECONDS = 5.0  # A final result is produced after this much audio
+OUTPUT_TOKENS = 32       # Tokens generated per LLM call, at most max_new_tokens
+
+class Model:
+    """Stands in for vosk.Model."""
+
+    def __init__(self, model_path=None):
+        self.model_path = model_path
+
+class KaldiRecognizer:
+    """Stands in for vosk.KaldiRecognizer: emits a word for every WORD_SECONDS of non-silent audio."""
+
+    def __init__(self, model, rate):
+        self.rate = rate
+        self.words_enabled = False
+        self.window_bytes = int(rate * WORD_SECONDS) * 2
+        self.pending = bytearray()
+        self.position = 0.0   # Seconds of audio consumed
+        self.utterance_start = 0.0
+        self.words = []
+
+    def SetWords(self, enabled):
+        self.words_enabled = enabled
+
+    def _consume(self, final=False):
+        while len(self.pending) >= self.window_bytes or (final and self.pending):
+            window = bytes(self.pending[:self.window_bytes])
+            del self.pending[:self.window_bytes]
+            duration = len(window) / 2 / self.rate
+            if speech.frame_rms(window) >= speech.SILENCE_RMS:
+                self.words.append({
+                    "conf": 1.0,
+                    "start": round(self.position, 2),
+                    "end": round(self.position + duration, 2),
+                    "word": f"word{zlib.crc32(window) % 1000}"
+                })
+            self.position += duration
+
+    def AcceptWaveform(self, data):
+        self.pending += data
+        self._consume()
+        return self.position - self.utterance_start >= UTTERANCE_SECONDS
+
+    def _take_result(self):
+        result = {"text": " ".join(word["word"] for word in self.words)}
+        if self.words_enabled and self.words:
+            result["result"] = self.words
+        self.words = []
+        self.utterance_start = self.position
+        return json.dumps(result)
+
+    def Result(self):
+        return self._take_result()
+
+    def PartialResult(self):
+        return json.dumps({"partial": " ".join(word["word"] for word in self.words)})
+
+    def FinalResult(self):
+        self._consume(final=True)
+        return self._take_result()
+
+class LLM:
+    """Stands in for a ctransformers model."""
+
+    model_name = "fake-llm"
+
+    def tokenize(self, text):
+        return [zlib.crc32(word.encode()) % 32000 for word in text.split()]
+
+    def _tokens(self, prompt, max_new_tokens):
+        seed = zlib.crc32(prompt.encode())
+        return [f" word{(seed + index) % 1000}" for index in range(min(OUTPUT_TOKENS, max_new_tokens))]
+
+    def __call__(self, prompt, max_new_tokens=256, temperature=0.8, stream=False, **kwargs):
+        tokens = self._tokens(prompt, max_new_tokens)
+        if stream:
+            return iter(tokens)
+        return "".join(tokens)
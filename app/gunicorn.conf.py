@@ -0,0 +1,13 @@
+# Gunicorn settings for the web server. nginx proxies to this address.
+bind = "127.0.0.1:5000"
+
+# Threaded workers: an open /api/events stream holds a thread for as long as the
+# page is open, and the Wi-Fi endpoints wait on subprocesses, so neither may
+# block the rest of the API.
+worker_class = "gthread"
+workers = 2
+threads = 8
+
+# Large chunked uploads and slow Wi-Fi scans can keep a request busy for a while
+timeout = 120
+graceful_timeout = 30
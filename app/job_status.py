@@ -0,0 +1,199 @@
+import time
+import sqlite3
+from contextlib import closing
+import meeting_index
+
+# One row per meeting with the latest state of its processing job. Every write
+# stamps the row with a new, increasing seq, so readers (the /api/events stream)
+# can ask for "everything that changed since seq N" with one indexed query.
+# Rows are never deleted (deleted meetings get the state "deleted"), which keeps
+# MAX(seq) increasing.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_status (
+    meeting_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    progress REAL,
+    detail TEXT,
+    enqueued_at REAL,
+    updated_at REAL NOT NULL,
+    seq INTEGER NOT NULL,
+    priority REAL,
+    worker_pid INTEGER
+);
+CREATE INDEX IF NOT EXISTS job_status_by_seq ON job_status (seq);
+"""
+# Columns added after the table was first created, as (name, type)
+ADDED_COLUMNS = [("priority", "REAL"), ("worker_pid", "INTEGER")]
+
+# Job states, in the order a job normally goes through them
+QUEUED = "queued"
+DECODING = "decoding"
+TRANSCRIBING = "transcribing"
+ANALYZING = "analyzing"
+RENDERING = "rendering"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+DELETED = "deleted"
+FINISHED_STATES = (DONE, FAILED, CANCELLED, DELETED)
+ACTIVE_STATES = (DECODING, TRANSCRIBING, ANALYZING, RENDERING)
+# A cancelled or deleted job keeps its state; stages still finishing must not overwrite it
+STOPPED_STATES = (CANCELLED, DELETED)
+
+PROGRESS_INTERVAL = 1.0  # Minimum seconds between progress writes for one job
+
+class JobCancelled(Exception):
+    """Raised in a worker to abandon a job that was cancelled or deleted while it ran."""
+
+_schema_ready = False
+
+def _add_columns(conn):
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(job_status)")}
+    for name, column_type in ADDED_COLUMNS:
+        if name in columns:
+            continue
+        try:
+            conn.execute(f"ALTER TABLE job_status ADD COLUMN {name} {column_type}")
+        except sqlite3.OperationalError as e:
+            if "duplicate column" not in str(e):
+                raise # Another process adding it at the same time is fine
+
+def get_connection():
+    global _schema_ready
+    conn = meeting_index.get_connection()
+    if not _schema_ready:
+        conn.executescript(SCHEMA)
+        _add_columns(conn)
+        _schema_ready = True
+    return conn
+
+def set_state(meeting_id, state, progress=None, detail=None, priority=None, enqueued_at=None):
+    """Records a job's state. Entering QUEUED also records the enqueue time and the job's priority.
+
+    A cancelled or deleted job only changes state when it is deleted.
+    """
+    now = time.time()
+    queued = state == QUEUED
+    stopped = ",".join("?" * len(STOPPED_STATES))
+    with closing(get_connection()) as conn, conn:
+        conn.execute(
+            "INSERT INTO job_status (meeting_id, state, progress, detail, enqueued_at, updated_at, seq, priority) "
+            "VALUES (?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_status), ?) "
+            "ON CONFLICT(meeting_id) DO UPDATE SET state = excluded.state, progress = excluded.progress, "
+            "detail = excluded.detail, updated_at = excluded.updated_at, seq = excluded.seq, "
+            "enqueued_at = CASE WHEN excluded.state = ? THEN excluded.enqueued_at ELSE job_status.enqueued_at END, "
+            "priority = CASE WHEN excluded.state = ? THEN excluded.priority ELSE job_status.priority END "
+            f"WHERE job_status.state NOT IN ({stopped}) OR excluded.state = ?",
+            (meeting_id, state, progress, detail, (enqueued_at or now) if queued else None, now,
+             priority if queued else None, QUEUED, QUEUED, *STOPPED_STATES, DELETED)
+        )
+
+def set_worker(meeting_id, pid):
+    """Records the process now running one of the job's stages. Returns the job's state."""
+    with closing(get_connection()) as conn, conn:
+        conn.execute("UPDATE job_status SET worker_pid = ? WHERE meeting_id = ?", (pid, meeting_id))
+        row = conn.execute("SELECT state FROM job_status WHERE meeting_id = ?", (meeting_id,)).fetchone()
+    return row['state'] if row else None
+
+def stop(meeting_id, state):
+    """Moves a job to CANCELLED or DELETED. Returns (its previous state, the pid of its last worker).
+
+    A job that has already finished keeps its state and detail, unless its meeting is being deleted.
+    """
+    with closing(get_connection()) as conn, conn:
+        row = conn.execute(
+            "SELECT state, worker_pid FROM job_status WHERE meeting_id = ?", (meeting_id,)
+        ).fetchone()
+        previous, pid = (row['state'], row['worker_pid']) if row else (None, None)
+        if state != DELETED and (previous is None or previous in FINISHED_STATES):
+            return previous, pid
+        conn.execute(
+            "INSERT INTO job_status (meeting_id, state, updated_at, seq) "
+            "VALUES (?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_status)) "
+            "ON CONFLICT(meeting_id) DO UPDATE SET state = excluded.state, progress = NULL, detail = NULL, "
+            "updated_at = excluded.updated_at, seq = excluded.seq",
+            (meeting_id, state, time.time())
+        )
+    return previous, pid
+
+def get_state(meeting_id):
+    """Returns a job's current state, or None if it has none."""
+    with closing(get_connection()) as conn:
+        row = conn.execute("SELECT state FROM job_status WHERE meeting_id = ?", (meeting_id,)).fetchone()
+    return row['state'] if row else None
+
+def get_enqueued_at(meeting_id):
+    """Returns when a job was last queued, as a Unix timestamp, or None."""
+    with closing(get_connection()) as conn:
+        row = conn.execute("SELECT enqueued_at FROM job_status WHERE meeting_id = ?", (meeting_id,)).fetchone()
+    return row['enqueued_at'] if row else None
+
+class ProgressReporter:
+    """Publishes the progress of one job stage, writing at most once per PROGRESS_INTERVAL."""
+
+    def __init__(self, meeting_id, state):
+        self.meeting_id = meeting_id
+        self.state = state
+        self.last_write = 0
+        set_state(meeting_id, state, 0.0)
+
+    def update(self, progress, detail=None):
+        now = time.monotonic()
+        if now - self.last_write < PROGRESS_INTERVAL:
+            return
+        self.last_write = now
+        set_state(self.meeting_id, self.state, None if progress is None else min(progress, 1.0), detail)
+
+def _row_to_status(row):
+    return {
+        "id": row['meeting_id'],
+        "state": row['state'],
+        "progress": row['progress'],
+        "detail": row['detail'],
+        "updated_at": row['updated_at']
+    }
+
+def latest_seq():
+    with closing(get_connection()) as conn:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM job_status").fetchone()[0]
+
+def queued_ids(conn):
+    """Returns the ids of queued jobs in the order the worker will take them: by priority, then enqueue time."""
+    rows = conn.execute(
+        "SELECT meeting_id FROM job_status WHERE state = ? ORDER BY COALESCE(priority, 0), enqueued_at", (QUEUED,)
+    )
+    return [row['meeting_id'] for row in rows]
+
+def changes_since(seq):
+    """Returns (jobs, queue, latest_seq) for every job whose status changed after seq.
+
+    queue is the ordered list of queued job ids, from which clients derive each
+    job's queue position.
+    """
+    with closing(get_connection()) as conn:
+        rows = conn.execute("SELECT * FROM job_status WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        if not rows:
+            return [], None, seq
+        return [_row_to_status(row) for row in rows], queued_ids(conn), rows[-1]['seq']
+
+def active_counts():
+    """Returns {state: number of jobs} for the states of unfinished jobs."""
+    placeholders = ",".join("?" * len(FINISHED_STATES))
+    with closing(get_connection()) as conn:
+        rows = conn.execute(
+            f"SELECT state, COUNT(*) AS count FROM job_status WHERE state NOT IN ({placeholders}) GROUP BY state",
+            FINISHED_STATES
+        ).fetchall()
+    return {row['state']: row['count'] for row in rows}
+
+def active_jobs():
+    """Returns (jobs, queue, latest_seq) for all jobs that haven't finished, as a starting snapshot."""
+    with closing(get_connection()) as conn:
+        # Read the snapshot and its seq in one transaction so no change falls in between
+        conn.execute("BEGIN")
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM job_status").fetchone()[0]
+        placeholders = ",".join("?" * len(FINISHED_STATES))
+        rows = conn.execute(
+            f"SELECT * FROM job_status WHERE state NOT IN ({placeholders}) ORDER BY seq", FINISHED_STATES
+        ).fetchall()
+        return [_row_to_status(row) for row in rows], queued_ids(conn), seq
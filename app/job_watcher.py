@@ -0,0 +1,115 @@
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008  # A job file written with open()/write() is complete
+IN_MOVED_TO = 0x00000080     # A job file was renamed into the queue (e.g. a recovered job)
+IN_Q_OVERFLOW = 0x00004000   # The kernel dropped events; the directory must be rescanned
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+READ_SIZE = 64 * 1024
+
+def _init_inotify(path):
+    """Returns an inotify file descriptor watching path, or None if inotify is unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(path), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+def schedule_by_mtime(path):
+    """The default schedule: every job is ready now, oldest first."""
+    return 0, os.path.getmtime(path)
+
+class JobQueueWatcher:
+    """Tracks *.job files in a queue directory as an in-memory backlog.
+
+    New jobs are picked up from inotify events as soon as they are written. When
+    inotify is unavailable the directory is rescanned every poll_interval seconds.
+
+    schedule(path) returns (ready_at, sort_key) for a job file: the job isn't
+    handed out before the Unix time ready_at, and among ready jobs the one with
+    the smallest sort_key goes first.
+    """
+
+    def __init__(self, queue_dir, poll_interval, suffix=".job", schedule=schedule_by_mtime):
+        self.queue_dir = queue_dir
+        self.poll_interval = poll_interval
+        self.suffix = suffix
+        self.schedule = schedule
+        self.backlog = {}  # Job filename -> (ready_at, sort_key)
+        # Start watching before the initial scan so no job slips in between
+        self.fd = _init_inotify(queue_dir)
+        self.rescan()
+
+    @property
+    def uses_inotify(self):
+        return self.fd is not None
+
+    def _add(self, job_filename):
+        try:
+            self.backlog[job_filename] = self.schedule(os.path.join(self.queue_dir, job_filename))
+        except FileNotFoundError:
+            self.backlog.pop(job_filename, None) # Claimed by another worker or cancelled meanwhile
+
+    def rescan(self):
+        """Adds queued jobs not yet in the backlog."""
+        for job_filename in os.listdir(self.queue_dir):
+            if job_filename.endswith(self.suffix) and job_filename not in self.backlog:
+                self._add(job_filename)
+
+    def _read_events(self):
+        """Adds the jobs reported by pending inotify events to the backlog."""
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            _, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b"\0"))
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                self.rescan()
+            elif name.endswith(self.suffix):
+                self._add(name) # Re-read even if known, e.g. a job queued again for a retry
+
+    def wait(self, timeout=None):
+        """Blocks until new jobs may have arrived or the timeout expires."""
+        if self.fd is None:
+            time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            self.rescan()
+            return
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            self._read_events()
+
+    def next_job(self):
+        """Blocks until a job is ready and removes the first one by sort key from the backlog.
+
+        The job file may already have been claimed by another worker, so callers
+        must still claim it atomically before processing.
+        """
+        while True:
+            now = time.time()
+            ready = [(sort_key, job_filename) for job_filename, (ready_at, sort_key) in self.backlog.items()
+                     if ready_at <= now]
+            if ready:
+                _, job_filename = min(ready)
+                del self.backlog[job_filename]
+                return job_filename
+            waiting = [ready_at for ready_at, _ in self.backlog.values()]
+            self.wait(min(waiting) - now if waiting else None)
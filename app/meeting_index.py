@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import fcntl
+import sqlite3
+from contextlib import closing
+
+# --- Configuration ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+
+TRANSCRIPTS_DIR = os.path.join(PROJECT_ROOT, "transcripts")
+DB_PATH = os.path.join(PROJECT_ROOT, "meetings.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    pdf_exists INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS meetings_by_date ON meetings (date DESC, id DESC);
+"""
+# Stored in the database's user_version once the index has been built from disk.
+# Other modules create the database too (job_status, metrics), so its existence
+# doesn't mean the meetings were ever indexed.
+INDEX_BUILT = 1
+
+_schema_ready = False
+
+def get_connection():
+    """Opens a connection to the meeting index, creating the schema on first use."""
+    global _schema_ready
+    # IMMEDIATE takes the write lock when a transaction starts, so concurrent writers
+    # from the web server, recorder and worker wait for each other instead of failing
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level="IMMEDIATE")
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        # WAL lets the web server read while the worker and recorder write
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        _schema_ready = True
+    return conn
+
+def pdf_filename_for(metadata):
+    """Returns the name of the PDF the worker renders for a meeting."""
+    return os.path.splitext(metadata.get('audio_filename', 'transcript'))[0] + ".pdf"
+
+def _upsert(conn, meeting_id, metadata, pdf_exists):
+    conn.execute(
+        "INSERT INTO meetings (id, date, metadata, pdf_exists) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET date = excluded.date, metadata = excluded.metadata, "
+        "pdf_exists = COALESCE(?, meetings.pdf_exists)",
+        (meeting_id, metadata.get('date', '1970-01-01'), json.dumps(metadata), int(bool(pdf_exists)),
+         None if pdf_exists is None else int(pdf_exists))
+    )
+
+def upsert_meeting(meeting_id, metadata, pdf_exists=None):
+    """Adds or updates a meeting. pdf_exists=None keeps the stored value."""
+    with closing(get_connection()) as conn, conn:
+        _upsert(conn, meeting_id, metadata, pdf_exists)
+
+def update_metadata(meeting_id, meeting_path, changes):
+    """Applies changes to a meeting's metadata.json and the index. Returns the updated metadata.
+
+    The file is re-read under an exclusive lock, so concurrent updates (e.g. a
+    rename from the web UI and the worker archiving the audio) each keep the
+    other's fields instead of writing back a stale copy.
+    """
+    with open(os.path.join(meeting_path, 'metadata.json'), 'r+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        metadata = json.load(f)
+        metadata.update(changes)
+        f.seek(0)
+        json.dump(metadata, f, indent=2)
+        f.truncate()
+        # Indexed while still locked, so the index ends up with the last write too
+        upsert_meeting(meeting_id, metadata)
+    return metadata
+
+def set_pdf_exists(meeting_id, pdf_exists=True):
+    with closing(get_connection()) as conn, conn:
+        conn.execute("UPDATE meetings SET pdf_exists = ? WHERE id = ?", (int(pdf_exists), meeting_id))
+
+def delete_meeting(meeting_id):
+    with closing(get_connection()) as conn, conn:
+        conn.execute("DELETE FROM meetings WHERE id = ?", (meeting_id,))
+
+class InvalidCursor(ValueError):
+    """A list_meetings cursor that wasn't returned by list_meetings."""
+
+def _row_to_meeting(row):
+    meeting = json.loads(row['metadata'])
+    meeting['id'] = row['id']
+    meeting['pdf_exists'] = bool(row['pdf_exists'])
+    return meeting
+
+def list_meetings(limit=None, cursor=None):
+    """Returns (meetings, next_cursor) sorted by date, newest first.
+
+    cursor is the next_cursor of the previous page; next_cursor is None on the last page.
+    Raises InvalidCursor if cursor is not one.
+    """
+    query = "SELECT id, metadata, pdf_exists, date FROM meetings"
+    params = []
+    if cursor:
+        if "|" not in cursor:
+            raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+        date, meeting_id = cursor.split("|", 1)
+        query += " WHERE date < ? OR (date = ? AND id < ?)"
+        params += [date, date, meeting_id]
+    query += " ORDER BY date DESC, id DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit + 1) # One extra row tells us whether there is another page
+
+    with closing(get_connection()) as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['date']}|{rows[-1]['id']}"
+    return [_row_to_meeting(row) for row in rows], next_cursor
+
+def rebuild_from_disk():
+    """Replaces the index with the meetings found in the transcripts directory."""
+    count = 0
+    with closing(get_connection()) as conn, conn:
+        conn.execute("DELETE FROM meetings")
+        for meeting_id in os.listdir(TRANSCRIPTS_DIR):
+            metadata_path = os.path.join(TRANSCRIPTS_DIR, meeting_id, 'metadata.json')
+            if not os.path.exists(metadata_path):
+                continue
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+            pdf_exists = os.path.exists(os.path.join(TRANSCRIPTS_DIR, meeting_id, pdf_filename_for(metadata)))
+            _upsert(conn, meeting_id, metadata, pdf_exists)
+            count += 1
+        conn.execute(f"PRAGMA user_version = {INDEX_BUILT}")
+    return count
+
+def rebuild_if_missing():
+    """Builds the index from disk the first time the appliance runs with it."""
+    if not os.path.isdir(TRANSCRIPTS_DIR):
+        return
+    with closing(get_connection()) as conn:
+        built = conn.execute("PRAGMA user_version").fetchone()[0] >= INDEX_BUILT
+    if not built:
+        print(f"Indexed {rebuild_from_disk()} meetings.")
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python3 meeting_index.py rebuild")
+        sys.exit(1)
+    print(f"Indexed {rebuild_from_disk()} meetings.")
@@ -0,0 +1,155 @@
+import time
+import bisect
+import functools
+from contextlib import closing
+import meeting_index
+import job_status
+
+# Counters and histograms shared by the worker, recorder and web server. Every
+# process writes its samples to one table in the meeting index database, so
+# /api/metrics aggregates all of them by reading it, and the values survive
+# restarts the way Prometheus counters should. Samples are only written on
+# events (a stage finishing, a chunk arriving, a recording ending), never in a
+# hot loop, so the cost is one small transaction per event.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+) WITHOUT ROWID;
+"""
+
+COUNTERS = {
+    "transcriber_stage_failures_total": "Job stages that raised an error.",
+    "transcriber_job_retries_total": "Jobs queued again after an error.",
+    "transcriber_jobs_cancelled_total": "Queued or running jobs that were cancelled or deleted.",
+    "transcriber_audio_seconds_total": "Seconds of audio transcribed by the worker.",
+    "transcriber_llm_tokens_total": "Tokens generated by the LLM.",
+    "transcriber_uploaded_bytes_total": "Bytes of audio received by the web server.",
+    "transcriber_recorded_seconds_total": "Seconds of audio recorded by the hardware recorder.",
+    "transcriber_recorder_overruns_total": (
+        "Recorder overruns: input overflows reported by the audio device (source=device), "
+        "or recordings whose writer fell behind the ring buffer (source=ring_buffer)."),
+    "transcriber_recorder_lost_seconds_total": "Seconds of recorded audio overwritten before they were written to disk.",
+    "transcriber_live_transcription_abandoned_total": "Recordings whose live transcription fell behind."
+}
+
+HISTOGRAMS = {
+    "transcriber_stage_duration_seconds": (
+        "Wall time of each job stage.", (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1200, 3600)),
+    "transcriber_job_latency_seconds": (
+        "Time from a job being queued to its PDF being ready.", (10, 30, 60, 120, 300, 600, 1200, 3600, 7200)),
+    "transcriber_transcription_rtf": (
+        "Real-time factor of transcription (processing time / audio length).", (0.05, 0.1, 0.25, 0.5, 1, 2, 4)),
+    "transcriber_llm_tokens_per_second": (
+        "LLM generation speed per analysis.", (0.5, 1, 2, 4, 8, 16, 32))
+}
+
+_schema_ready = False
+
+def get_connection():
+    global _schema_ready
+    conn = meeting_index.get_connection()
+    if not _schema_ready:
+        conn.executescript(SCHEMA)
+        _schema_ready = True
+    return conn
+
+def _label_string(labels):
+    return ",".join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+
+def _add(conn, name, labels, amount):
+    conn.execute(
+        "INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) "
+        "ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value",
+        (name, _label_string(labels), amount)
+    )
+
+def inc(name, amount=1, **labels):
+    """Adds amount to a counter."""
+    if name not in COUNTERS:
+        raise KeyError(f"Unknown counter: {name}")
+    with closing(get_connection()) as conn, conn:
+        _add(conn, name, labels, amount)
+
+def observe(name, value, **labels):
+    """Records one observation in a histogram."""
+    _, buckets = HISTOGRAMS[name]
+    with closing(get_connection()) as conn, conn:
+        # Buckets are cumulative, so only the smallest one the value fits in and those above it count it
+        for bound in buckets[bisect.bisect_left(buckets, value):]:
+            _add(conn, f"{name}_bucket", dict(labels, le=str(bound)), 1)
+        _add(conn, f"{name}_bucket", dict(labels, le="+Inf"), 1)
+        _add(conn, f"{name}_sum", labels, value)
+        _add(conn, f"{name}_count", labels, 1)
+
+def timed_stage(stage_name):
+    """Decorates a job stage to record its duration, or a failure if it raises."""
+    def decorate(stage):
+        @functools.wraps(stage)
+        def wrapper(job):
+            start = time.monotonic()
+            try:
+                result = stage(job)
+            except job_status.JobCancelled:
+                raise
+            except Exception:
+                inc("transcriber_stage_failures_total", stage=stage_name)
+                raise
+            observe("transcriber_stage_duration_seconds", time.monotonic() - start, stage=stage_name)
+            return result
+        return wrapper
+    return decorate
+
+def _split_le(labels):
+    """Splits a bucket's label string into (its other labels, its le bound)."""
+    others = [label for label in labels.split(",") if not label.startswith("le=")]
+    le = next(label for label in labels.split(",") if label.startswith("le="))
+    return ",".join(others), le[4:-1]
+
+def _format_value(value):
+    # Byte counters pass 10^9 quickly; ":g" would round them to 6 significant digits
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _sample(name, labels, value):
+    return f"{name}{{{labels}}} {_format_value(value)}" if labels else f"{name} {_format_value(value)}"
+
+def render():
+    """Returns every metric in the Prometheus text exposition format."""
+    with closing(get_connection()) as conn:
+        rows = conn.execute("SELECT name, labels, value FROM metrics").fetchall()
+    counts = job_status.active_counts()
+
+    by_name = {}
+    for row in rows:
+        by_name.setdefault(row['name'], []).append(row)
+
+    lines = [
+        "# HELP transcriber_jobs Jobs waiting or being processed, by state. The queued count is the queue depth.",
+        "# TYPE transcriber_jobs gauge"
+    ]
+    for state in (job_status.QUEUED, job_status.DECODING, job_status.TRANSCRIBING,
+                  job_status.ANALYZING, job_status.RENDERING):
+        lines.append(_sample("transcriber_jobs", f'state="{state}"', counts.get(state, 0)))
+
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [_sample(name, row['labels'], row['value']) for row in by_name.get(name, [])]
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        groups = {}
+        for row in by_name.get(f"{name}_bucket", []):
+            labels, le = _split_le(row['labels'])
+            groups.setdefault(labels, {})[le] = row['value']
+        for labels, counts in groups.items():
+            # Buckets below the smallest observation were never written; they hold 0
+            for le in [str(bound) for bound in buckets] + ["+Inf"]:
+                bucket_labels = ",".join(filter(None, [f'le="{le}"', labels]))
+                lines.append(_sample(f"{name}_bucket", bucket_labels, counts.get(le, 0)))
+        for suffix in ("_sum", "_count"):
+            lines += [_sample(f"{name}{suffix}", row['labels'], row['value']) for row in by_name.get(name + suffix, [])]
+    return "\n".join(lines) + "\n"
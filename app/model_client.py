@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+from multiprocessing.connection import Client
+from model_server import SOCKET_PATH
+
+# Drop-in replacements for vosk.Model, vosk.KaldiRecognizer and a ctransformers
+# model that forward every call to the model server (see model_server.py), so the
+# calling process never loads a model itself.
+
+CONNECT_TIMEOUT = 300  # Seconds to wait for the server to come up (it loads the models first)
+
+class ModelServerError(Exception):
+    """A request the model server could not complete."""
+
+class _Connection:
+    """A lazily opened connection to the model server, reopened after fork.
+
+    Forked children (e.g. pool processes) inherit the object but must not share
+    the parent's socket, so each process opens its own.
+    """
+
+    def __init__(self, socket_path=SOCKET_PATH, connect_timeout=CONNECT_TIMEOUT):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self.conn = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.socket_path, family="AF_UNIX")
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise ModelServerError(f"Model server not reachable at {self.socket_path}")
+                time.sleep(1)
+
+    def stream(self, op, *args):
+        """Sends one request and yields the tokens it streams. The reply's value is the generator's return value."""
+        with self.lock:
+            if self.conn is None or self.pid != os.getpid():
+                self.conn = self._connect()
+                self.pid = os.getpid()
+            self.conn.send((op, *args))
+            finished = False
+            try:
+                while True:
+                    status, value = self.conn.recv()
+                    if status == "token":
+                        yield value
+                        continue
+                    finished = True
+                    if status == "error":
+                        raise ModelServerError(value)
+                    return value
+            finally:
+                if not finished:
+                    # Abandoned midway; drop the connection rather than leave a reply unread
+                    self.conn.close()
+                    self.conn = None
+
+    def request(self, op, *args):
+        """Sends one request and returns the reply's value."""
+        tokens = self.stream(op, *args)
+        try:
+            while True:
+                next(tokens)
+        except StopIteration as done:
+            return done.value
+
+class Model:
+    """Stands in for vosk.Model."""
+
+    def __init__(self, socket_path=SOCKET_PATH, connect_timeout=CONNECT_TIMEOUT):
+        self.connection = _Connection(socket_path, connect_timeout)
+
+class KaldiRecognizer:
+    """Stands in for vosk.KaldiRecognizer. Single use: FinalResult() frees it on the server."""
+
+    def __init__(self, model, rate):
+        self.connection = model.connection
+        self.id = self.connection.request("recognizer", rate)
+
+    def SetWords(self, enabled):
+        self.connection.request("set_words", self.id, enabled)
+
+    def AcceptWaveform(self, data):
+        return self.connection.request("accept", self.id, bytes(data))
+
+    def Result(self):
+        return self.connection.request("result", self.id)
+
+    def PartialResult(self):
+        return self.connection.request("partial_result", self.id)
+
+    def FinalResult(self):
+        return self.connection.request("final_result", self.id)
+
+class LLM:
+    """Stands in for a ctransformers model: call it to generate, tokenize() to count tokens."""
+
+    def __init__(self, socket_path=SOCKET_PATH):
+        self.connection = _Connection(socket_path)
+        self._model_name = None
+
+    @property
+    def model_name(self):
+        """The name of the model file the server loaded, used in cache keys."""
+        if self._model_name is None:
+            self._model_name = self.connection.request("info")["llm_model"]
+        return self._model_name
+
+    def tokenize(self, text):
+        return self.connection.request("tokenize", text)
+
+    def __call__(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self.connection.stream("generate", prompt, kwargs, True)
+        return self.connection.request("generate", prompt, kwargs, False)
@@ -0,0 +1,164 @@
+import os
+import sys
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Listener
+
+# --- Configuration ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+
+SOCKET_PATH = os.path.join(PROJECT_ROOT, "model_server.sock")
+
+VOSK_MODEL_PATH = "/opt/models/vosk-model"
+LLAMA_MODEL_PATH = "/opt/models/tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf"
+LLM_CONTEXT_LENGTH = 2048     # TinyLlama's context window
+LLM_BATCH_SIZE = 8            # Prompt tokens evaluated per step
+LLM_THREADS = os.cpu_count() or 1  # The server runs one LLM call at a time, so it can use every core
+
+# The server holds the only copy of each model. Clients (see model_client.py) talk
+# to it over a Unix socket using multiprocessing.connection, which frames pickled
+# messages. Only processes that can open the socket file, i.e. the service user,
+# can connect.
+#
+# Requests are tuples (op, *args); replies are ("ok", value) or ("error", message).
+# A streaming "generate" sends ("token", text) messages before its reply.
+#
+#   info                          -> {"llm_model": name}
+#   recognizer rate               -> recognizer id, private to the connection
+#   set_words id enabled          -> None
+#   accept id pcm                 -> bool, as KaldiRecognizer.AcceptWaveform
+#   result id / partial_result id -> JSON string
+#   final_result id               -> JSON string; the recognizer is freed
+#   tokenize text                 -> list of token ids
+#   generate prompt kwargs stream -> generated text
+#
+# Vosk recognizers run on the connection's own thread; the model is shared and
+# Vosk releases the GIL while recognizing, so workers transcribe in parallel.
+# Tokenizing only reads the LLM's vocabulary, so it is also answered on the
+# connection's thread and never waits for a generation. The LLM has one context,
+# so generations from all connections go through one queue served by a single thread.
+
+class ModelServer:
+    def __init__(self, vosk_model, recognizer_class, llm, llm_name):
+        self.vosk_model = vosk_model
+        self.recognizer_class = recognizer_class
+        self.llm = llm
+        self.llm_name = llm_name
+        self.llm_requests = queue.Queue()
+
+    def _llm_loop(self):
+        while True:
+            args, conn, future = self.llm_requests.get()
+            try:
+                future.set_result(self._generate(args, conn))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _generate(self, args, conn):
+        prompt, kwargs, stream = args
+        if not stream:
+            return self.llm(prompt, **kwargs)
+        output = ""
+        # The requesting connection's thread is blocked waiting for the reply, so only this thread writes to conn
+        for token in self.llm(prompt, stream=True, **kwargs):
+            output += token
+            conn.send(("token", token))
+        return output
+
+    def _handle(self, op, args, conn, recognizers):
+        if op == "info":
+            return {"llm_model": self.llm_name}
+        if op == "recognizer":
+            recognizer_id = max(recognizers, default=0) + 1
+            recognizers[recognizer_id] = self.recognizer_class(self.vosk_model, args[0])
+            return recognizer_id
+        if op == "set_words":
+            return recognizers[args[0]].SetWords(args[1])
+        if op == "accept":
+            return bool(recognizers[args[0]].AcceptWaveform(args[1]))
+        if op == "result":
+            return recognizers[args[0]].Result()
+        if op == "partial_result":
+            return recognizers[args[0]].PartialResult()
+        if op == "final_result":
+            return recognizers.pop(args[0]).FinalResult()
+        if op == "tokenize":
+            return list(self.llm.tokenize(args[0]))
+        if op == "generate":
+            future = Future()
+            self.llm_requests.put((args, conn, future))
+            return future.result()
+        raise ValueError(f"Unknown request: {op}")
+
+    def _serve_connection(self, conn):
+        recognizers = {}
+        with conn:
+            while True:
+                try:
+                    op, *args = conn.recv()
+                except (EOFError, OSError):
+                    return # Client went away; its recognizers are dropped with it
+                try:
+                    reply = ("ok", self._handle(op, args, conn, recognizers))
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(reply)
+                except OSError:
+                    return # e.g. the client abandoned a streaming generate and disconnected
+
+    def serve(self, socket_path=SOCKET_PATH):
+        if os.path.exists(socket_path):
+            os.remove(socket_path) # Left behind by a previous run
+        threading.Thread(target=self._llm_loop, daemon=True).start()
+        old_umask = os.umask(0o177) # Create the socket readable and writable by the owner only
+        try:
+            listener = Listener(socket_path, family="AF_UNIX")
+        finally:
+            os.umask(old_umask)
+        print(f"Model server listening on {socket_path}")
+        with listener:
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+def load_llm(context_length=LLM_CONTEXT_LENGTH, threads=LLM_THREADS, batch_size=LLM_BATCH_SIZE):
+    """Loads the Llama model with ctransformers."""
+    from ctransformers import AutoModelForCausalLM
+
+    if not os.path.exists(LLAMA_MODEL_PATH):
+        raise FileNotFoundError(f"Llama model not found at {LLAMA_MODEL_PATH}")
+    # GGUF weights are mmap'd, so they live in the page cache rather than this process's heap
+    return AutoModelForCausalLM.from_pretrained(
+        LLAMA_MODEL_PATH,
+        model_type="llama",
+        gpu_layers=0,  # Force CPU-only inference, crucial for RPi
+        threads=threads,
+        batch_size=batch_size,
+        context_length=context_length
+    )
+
+def load_server(fake=False):
+    """Loads the models (or fake stand-ins) and returns a ModelServer for them."""
+    if fake:
+        import fake_models
+        return ModelServer(fake_models.Model(), fake_models.KaldiRecognizer, fake_models.LLM(),
+                           fake_models.LLM.model_name)
+
+    from vosk import Model, KaldiRecognizer
+
+    print("Loading models...")
+    if not os.path.exists(VOSK_MODEL_PATH):
+        raise FileNotFoundError(f"Vosk model not found at {VOSK_MODEL_PATH}")
+    vosk_model = Model(VOSK_MODEL_PATH)
+    llm = load_llm()
+    print("Models loaded successfully.")
+    return ModelServer(vosk_model, KaldiRecognizer, llm, os.path.basename(LLAMA_MODEL_PATH))
+
+if __name__ == "__main__":
+    if sys.argv[1:] not in ([], ["--fake"]):
+        print("Usage: python3 model_server.py [--fake]")
+        sys.exit(1)
+    load_server(fake=sys.argv[1:] == ["--fake"]).serve()
@@ -0,0 +1,131 @@
+import time
+import signal
+import multiprocessing
+import multiprocessing.connection
+
+# Forked children share the already-loaded models with the parent through copy-on-write
+ctx = multiprocessing.get_context("fork")
+
+QUEUE_SIZE = 2  # Jobs allowed to wait between two stages before the earlier stage blocks
+ROOM_POLL_INTERVAL = 0.2  # Seconds between checks for a free first stage in wait_for_room()
+
+def _run_child(target, args):
+    # Restarted children inherit the supervisor's SIGTERM handler; a child should just exit
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    target(*args)
+
+def run_supervised(children):
+    """Forks one process per (name, target, args) and restarts any that exit.
+
+    Runs until SIGTERM, which terminates all children.
+    """
+    running = {}
+
+    def start(name, target, args):
+        process = ctx.Process(target=_run_child, args=(target, args), name=name)
+        process.start()
+        running[process.sentinel] = (name, target, args, process)
+        print(f"Started {name} (pid {process.pid})")
+
+    def stop(signum, frame):
+        for *_, process in running.values():
+            process.terminate()
+        for *_, process in running.values():
+            process.join()
+        raise SystemExit(0)
+
+    for name, target, args in children:
+        start(name, target, args)
+    signal.signal(signal.SIGTERM, stop)
+
+    while True:
+        for sentinel in multiprocessing.connection.wait(list(running)):
+            name, target, args, process = running.pop(sentinel)
+            process.join()
+            print(f"!!! {name} (pid {process.pid}) exited with code {process.exitcode}. Restarting.")
+            start(name, target, args)
+
+class Pipeline:
+    """Job processing split into stages that run concurrently, connected by bounded queues.
+
+    stages is a list of (name, func, concurrency). Each func takes a job dict and
+    returns it for the next stage, or None to drop the job. finish(job) is called
+    once a job leaves the pipeline, whether it completed, was dropped or failed.
+    on_error(job, exception), if given, is called first when a stage raises.
+
+    A feeder that calls wait_for_room() before taking each job leaves the choice
+    of the next job until the pipeline can start it, instead of queueing jobs
+    ahead: it waits until no job is queued between any two stages and the first
+    admit_stages stages each have an idle process. Jobs then only ever wait
+    behind jobs that are already running.
+    """
+
+    def __init__(self, stages, finish, on_error=None, queue_size=QUEUE_SIZE, admit_stages=1):
+        self.stages = stages
+        self.finish = finish
+        self.on_error = on_error
+        self.admit_stages = admit_stages
+        # queues[i] feeds stage i
+        self.queues = [ctx.Queue(queue_size) for _ in stages]
+        # Jobs put in each stage's queue and not yet taken out
+        self.waiting = ctx.Array("i", len(stages))
+        # One flag per stage process, set while it holds a job. A restarted process
+        # clears its own flag, so a crash can't leave a stage marked busy forever.
+        self.busy = ctx.Array("b", sum(concurrency for _, _, concurrency in stages), lock=False)
+
+    def _slots(self, index):
+        first = sum(concurrency for _, _, concurrency in self.stages[:index])
+        return range(first, first + self.stages[index][2])
+
+    def _has_room(self):
+        if any(self.waiting[index] for index in range(len(self.stages))):
+            return False
+        return all(any(not self.busy[slot] for slot in self._slots(index)) for index in range(self.admit_stages))
+
+    def wait_for_room(self):
+        """Blocks until nothing is queued between stages and the first admit_stages stages have an idle process."""
+        while not self._has_room():
+            time.sleep(ROOM_POLL_INTERVAL)
+
+    def _put(self, index, job):
+        with self.waiting.get_lock():
+            self.waiting[index] += 1
+        self.queues[index].put(job)
+
+    def submit(self, job):
+        """Hands a job to the first stage, blocking while that stage is backed up."""
+        self._put(0, job)
+
+    def _stage_loop(self, index, slot):
+        name, func, _ = self.stages[index]
+        in_queue = self.queues[index]
+        has_next = index + 1 < len(self.queues)
+        self.busy[slot] = 0
+        while True:
+            job = in_queue.get()
+            # Marked busy before it stops counting as waiting, so it never looks free in between
+            self.busy[slot] = 1
+            with self.waiting.get_lock():
+                self.waiting[index] -= 1
+            try:
+                result = func(job)
+            except Exception as e:
+                print(f"!!! An error occurred in the {name} stage for job {job['meeting_id']}: {e}")
+                if self.on_error:
+                    self.on_error(job, e)
+                result = None
+
+            if result is None or not has_next:
+                self.finish(job)
+            else:
+                # Still busy until the next stage takes the job
+                self._put(index + 1, result)
+            self.busy[slot] = 0
+
+    def children(self):
+        """Returns the (name, target, args) of every stage process, for run_supervised."""
+        return [
+            (f"{name}-{i}", self._stage_loop, (index, slot))
+            for index, (name, _, concurrency) in enumerate(self.stages)
+            for i, slot in zip(range(concurrency), self._slots(index))
+        ]
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import tempfile
+from xml.sax.saxutils import escape
+import speech
+
+# A meeting's report is rendered from structured artifacts kept in its folder:
+# transcript.json (timestamped segments, see speech.py), analysis.json and
+# metadata.json. Each output format is rendered the first time it is requested
+# and kept next to them as <audio name>.<format>. reports.json records a
+# fingerprint of the inputs each file was rendered from; a file is re-rendered
+# when its inputs change, so renaming a meeting or re-running the analysis only
+# re-renders what is downloaded next.
+
+ANALYSIS_FILENAME = "analysis.json"
+METADATA_FILENAME = "metadata.json"
+MANIFEST_FILENAME = "reports.json"
+LOCK_FILENAME = ".reports.lock"  # Held while a report is rendered and the manifest updated
+REPORT_VERSION = 1  # Bump when the renderers change, to re-render existing reports
+
+PARAGRAPH_WORDS = 120  # Longer transcript segments are split into paragraphs of about this many words
+CUE_WORDS = 12         # Words per subtitle cue
+CUE_MAX_SECONDS = 6    # Longest a subtitle cue stays on screen
+
+def _write_atomic(path, write):
+    # A unique name, since gunicorn threads in one process may write the same file at once
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    os.chmod(tmp_path, 0o644) # mkstemp creates it private; nginx serves reports as another user
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def parse_analysis(text):
+    """Splits the LLM's analysis into its summary paragraph(s) and bulleted key points."""
+    summary = []
+    key_points = []
+    for line in text.strip().splitlines():
+        line = line.strip()
+        if line[:1] in ("-", "*", "•") or (line[:1].isdigit() and line[1:3] in (". ", ") ")):
+            key_points.append(line.lstrip("-*•0123456789.) ").strip())
+        elif line and not key_points:
+            summary.append(line)
+    return {"summary": " ".join(summary), "key_points": key_points}
+
+def save_analysis(meeting_path, analysis, model_name):
+    """Stores the analysis as a structured artifact next to the transcript."""
+    artifact = dict(parse_analysis(analysis), text=analysis, model=model_name, created=time.time())
+    def write(path):
+        with open(path, 'w') as f:
+            json.dump(artifact, f, indent=2)
+    _write_atomic(os.path.join(meeting_path, ANALYSIS_FILENAME), write)
+
+def load_analysis(meeting_path):
+    """Returns the analysis artifact, or None for meetings processed before it existed."""
+    analysis_path = os.path.join(meeting_path, ANALYSIS_FILENAME)
+    if not os.path.exists(analysis_path):
+        return None
+    with open(analysis_path, 'r') as f:
+        return json.load(f)
+
+def load_metadata(meeting_path):
+    with open(os.path.join(meeting_path, METADATA_FILENAME), 'r') as f:
+        return json.load(f)
+
+def iter_paragraphs(segments):
+    """Yields (start, text) paragraphs of at most about PARAGRAPH_WORDS words from transcript segments."""
+    for segment in segments:
+        words = segment["words"] or [{"word": word, "start": segment["start"]} for word in segment["text"].split()]
+        for index in range(0, len(words), PARAGRAPH_WORDS):
+            chunk = words[index:index + PARAGRAPH_WORDS]
+            yield chunk[0].get("start", segment["start"]), " ".join(word["word"] for word in chunk)
+
+def iter_cues(segments):
+    """Yields (start, end, text) subtitle cues, splitting segments by their word timestamps."""
+    for segment in segments:
+        if not segment["words"]:
+            if segment["start"] is not None:
+                yield segment["start"], segment["end"], segment["text"]
+            continue
+        cue = []
+        for word in segment["words"]:
+            if cue and (len(cue) >= CUE_WORDS or word["end"] - cue[0]["start"] > CUE_MAX_SECONDS):
+                yield cue[0]["start"], cue[-1]["end"], " ".join(w["word"] for w in cue)
+                cue = []
+            cue.append(word)
+        if cue:
+            yield cue[0]["start"], cue[-1]["end"], " ".join(w["word"] for w in cue)
+
+def _clock(seconds):
+    return f"{int(seconds // 60):02d}:{int(seconds % 60):02d}"
+
+def _timestamp(seconds, separator):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+def render_pdf(path, transcript, analysis, metadata):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    doc = SimpleDocTemplate(path, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = [
+        Paragraph(escape(metadata.get('name', "Audio Transcription and Analysis")), styles['h1']),
+        Paragraph(escape(metadata.get('date', "")), styles['Normal']),
+        Spacer(1, 12)
+    ]
+
+    if analysis:
+        story.append(Paragraph("AI-Generated Analysis", styles['h2']))
+        if analysis["summary"]:
+            story.append(Paragraph(escape(analysis["summary"]), styles['BodyText']))
+        for point in analysis["key_points"]:
+            story.append(Paragraph(escape(point), styles['Bullet'], bulletText="•"))
+        if not analysis["summary"] and not analysis["key_points"]:
+            story.append(Paragraph(escape(analysis["text"]).replace("\n", "<br/>"), styles['BodyText']))
+        story.append(Spacer(1, 24))
+
+    # One small Paragraph per chunk of a segment, so layout cost grows linearly
+    # with the transcript instead of reflowing one giant paragraph
+    story.append(Paragraph("Full Transcript", styles['h2']))
+    for start, text in iter_paragraphs(transcript["segments"]):
+        prefix = f"<font color='grey'>[{_clock(start)}]</font> " if start is not None else ""
+        story.append(Paragraph(prefix + escape(text), styles['BodyText']))
+
+    doc.build(story)
+
+def render_txt(path, transcript, analysis, metadata):
+    with open(path, 'w') as f:
+        f.write(f"{metadata.get('name', '')}\n{metadata.get('date', '')}\n\n")
+        if analysis:
+            f.write(f"Analysis\n\n{analysis['text'].strip()}\n\n")
+        f.write("Transcript\n\n")
+        for start, text in iter_paragraphs(transcript["segments"]):
+            f.write(f"[{_clock(start)}] {text}\n\n" if start is not None else f"{text}\n\n")
+
+def render_srt(path, transcript, analysis, metadata):
+    with open(path, 'w') as f:
+        for index, (start, end, text) in enumerate(iter_cues(transcript["segments"]), 1):
+            f.write(f"{index}\n{_timestamp(start, ',')} --> {_timestamp(end, ',')}\n{text}\n\n")
+
+def render_vtt(path, transcript, analysis, metadata):
+    with open(path, 'w') as f:
+        f.write("WEBVTT\n\n")
+        for start, end, text in iter_cues(transcript["segments"]):
+            f.write(f"{_timestamp(start, '.')} --> {_timestamp(end, '.')}\n{text}\n\n")
+
+# Format -> (renderer, artifacts it is built from)
+FORMATS = {
+    "pdf": (render_pdf, (speech.TRANSCRIPT_FILENAME, ANALYSIS_FILENAME, METADATA_FILENAME)),
+    "txt": (render_txt, (speech.TRANSCRIPT_FILENAME, ANALYSIS_FILENAME, METADATA_FILENAME)),
+    "srt": (render_srt, (speech.TRANSCRIPT_FILENAME,)),
+    "vtt": (render_vtt, (speech.TRANSCRIPT_FILENAME,))
+}
+
+def report_filename(metadata, report_format):
+    return os.path.splitext(metadata.get('audio_filename', 'transcript'))[0] + "." + report_format
+
+def report_format_for(metadata, filename):
+    """Returns the format if filename is one of the meeting's reports, else None."""
+    extension = os.path.splitext(filename)[1]
+    report_format = extension[1:].lower()
+    if report_format in FORMATS and filename == report_filename(metadata, report_format):
+        return report_format
+    return None
+
+def _fingerprint(meeting_path, metadata, sources):
+    parts = [REPORT_VERSION]
+    for source in sources:
+        if source == METADATA_FILENAME:
+            # Only the fields shown in the reports; e.g. archiving rewrites audio_filename
+            parts.append([metadata.get('name'), metadata.get('date')])
+            continue
+        source_path = os.path.join(meeting_path, source)
+        if os.path.exists(source_path):
+            stat = os.stat(source_path)
+            parts.append([stat.st_mtime_ns, stat.st_size])
+        else:
+            parts.append(None)
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+def _load_manifest(meeting_path):
+    manifest_path = os.path.join(meeting_path, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def _record_render(meeting_path, report_format, fingerprint):
+    manifest = _load_manifest(meeting_path)
+    manifest[report_format] = fingerprint
+    def write(path):
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    _write_atomic(os.path.join(meeting_path, MANIFEST_FILENAME), write)
+
+def ensure_report(meeting_path, report_format, metadata=None):
+    """Returns the path of a meeting's report in the given format, rendering it if missing or stale.
+
+    Returns None if it can't be rendered because the meeting has no transcript.
+    """
+    metadata = metadata or load_metadata(meeting_path)
+    renderer, sources = FORMATS[report_format]
+    output_path = os.path.join(meeting_path, report_filename(metadata, report_format))
+    fingerprint = _fingerprint(meeting_path, metadata, sources)
+    if os.path.exists(output_path) and _load_manifest(meeting_path).get(report_format) == fingerprint:
+        return output_path
+
+    # Concurrent first downloads render once; the others wait and find it current
+    with open(os.path.join(meeting_path, LOCK_FILENAME), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(output_path) and _load_manifest(meeting_path).get(report_format) == fingerprint:
+            return output_path
+        return _render(meeting_path, report_format, metadata, output_path, fingerprint)
+
+def _render(meeting_path, report_format, metadata, output_path, fingerprint):
+    renderer, sources = FORMATS[report_format]
+    transcript = speech.load_transcript(meeting_path)
+    if transcript is None:
+        # Meetings from before transcript.json only have the PDF the worker rendered
+        return output_path if os.path.exists(output_path) else None
+    analysis = load_analysis(meeting_path)
+    if analysis is None and ANALYSIS_FILENAME in sources and os.path.exists(output_path):
+        # Re-rendering a report from before analysis.json would drop its analysis
+        return output_path
+    _write_atomic(output_path, lambda path: renderer(path, transcript, analysis, metadata))
+    _record_render(meeting_path, report_format, fingerprint)
+    print(f"Rendered {os.path.basename(output_path)}")
+    return output_path
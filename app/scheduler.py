@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import signal
+import functools
+import job_status
+import metrics
+import speech
+
+# --- Configuration ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+
+JOB_QUEUE_DIR = os.path.join(PROJECT_ROOT, "job_queue")
+
+# How the worker picks the next job:
+#   "priority"       - recordings from the hardware switch and short uploads first
+#   "shortest_first" - shortest audio first (shortest-job-first)
+# Jobs of equal priority are taken in the order they were queued.
+SCHEDULING_POLICY = "priority"
+SHORT_JOB_SECONDS = 600      # Uploads up to this long count as short under "priority"
+UNKNOWN_DURATION = 24 * 3600 # Assumed length of audio that can't be measured (e.g. still uploading)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+MAX_ATTEMPTS = 3             # Times a job is tried before it is marked failed
+RETRY_BACKOFF_SECONDS = 30   # Wait before the first retry; doubles with every further attempt
+
+# Cancelling a job signals the worker process running it. The signal handler
+# raises JobCancelled, which unwinds the stage, terminates its process pools and
+# ffmpeg, and frees the CPU right away rather than when the stage would end.
+CANCEL_SIGNAL = signal.SIGUSR1
+
+# A job file holds one JSON object:
+#   {"meeting_id", "source", "duration", "priority", "enqueued_at", "attempt", "not_before"}
+# Files from older versions hold just the meeting id.
+
+def job_path(meeting_id):
+    return os.path.join(JOB_QUEUE_DIR, f"{meeting_id}.job")
+
+def priority_for(source, duration):
+    """Returns a job's priority; lower runs first."""
+    if SCHEDULING_POLICY == "shortest_first":
+        return duration if duration is not None else UNKNOWN_DURATION
+    if source == "recorder" or (duration is not None and duration <= SHORT_JOB_SECONDS):
+        return PRIORITY_HIGH
+    return PRIORITY_NORMAL
+
+def _write_entry(entry):
+    # Written under a name the watcher ignores, then renamed into place in one step
+    path = job_path(entry["meeting_id"])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+def enqueue(meeting_id, audio_path=None, source="upload"):
+    """Queues a meeting for the worker, prioritized by where it came from and its audio length."""
+    duration = speech.get_duration(audio_path) if audio_path and os.path.exists(audio_path) else None
+    entry = {
+        "meeting_id": meeting_id,
+        "source": source,
+        "duration": duration,
+        "priority": priority_for(source, duration),
+        "enqueued_at": time.time(),
+        "attempt": 0,
+        "not_before": 0
+    }
+    os.makedirs(JOB_QUEUE_DIR, exist_ok=True)
+    job_status.set_state(meeting_id, job_status.QUEUED, priority=entry["priority"], enqueued_at=entry["enqueued_at"])
+    _write_entry(entry)
+
+def read_job(path):
+    """Returns the entry in a job file, filling in defaults for files from older versions."""
+    with open(path, 'r') as f:
+        content = f.read().strip()
+    meeting_id = os.path.basename(path)[:-len(".job")]
+    try:
+        entry = json.loads(content)
+    except ValueError:
+        entry = None
+    if not isinstance(entry, dict):
+        entry = {"meeting_id": meeting_id, "enqueued_at": os.path.getmtime(path)}
+    defaults = {"source": "upload", "duration": None, "priority": PRIORITY_NORMAL, "attempt": 0, "not_before": 0}
+    return dict(defaults, **entry)
+
+def schedule(path):
+    """Returns (ready_at, sort_key) for a job file, for JobQueueWatcher."""
+    entry = read_job(path)
+    return entry["not_before"], (entry["priority"], entry["enqueued_at"])
+
+def retry_or_fail(entry, error):
+    """Queues a job that raised again after a backoff, or marks it failed once it has used every attempt."""
+    meeting_id = entry["meeting_id"]
+    if isinstance(error, job_status.JobCancelled) or job_status.get_state(meeting_id) in job_status.STOPPED_STATES:
+        return
+    attempt = entry["attempt"] + 1
+    if attempt >= MAX_ATTEMPTS:
+        job_status.set_state(meeting_id, job_status.FAILED, detail=str(error))
+        return
+
+    delay = RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+    print(f"Retrying job {meeting_id} in {delay}s (attempt {attempt + 1} of {MAX_ATTEMPTS}).")
+    metrics.inc("transcriber_job_retries_total")
+    retry = dict(entry, attempt=attempt, not_before=time.time() + delay)
+    # Keeps its original enqueue time, so it doesn't lose its place to jobs queued since
+    job_status.set_state(meeting_id, job_status.QUEUED, detail=f"Retrying in {delay}s after an error: {error}",
+                         priority=retry["priority"], enqueued_at=retry["enqueued_at"])
+    _write_entry(retry)
+
+def cancel(meeting_id, state=job_status.CANCELLED):
+    """Stops a job, whether it is queued or running. Returns False if it had already finished.
+
+    state is CANCELLED, or DELETED when the meeting is being deleted.
+    """
+    previous, pid = job_status.stop(meeting_id, state)
+    try:
+        os.remove(job_path(meeting_id))
+    except FileNotFoundError:
+        pass # Already claimed; the worker drops it before its next stage
+    if previous is None or previous in job_status.FINISHED_STATES:
+        return False
+    if previous in job_status.ACTIVE_STATES and pid:
+        try:
+            os.kill(pid, CANCEL_SIGNAL)
+        except ProcessLookupError:
+            pass
+    metrics.inc("transcriber_jobs_cancelled_total")
+    return True
+
+# --- Worker side ---
+
+_current_job = None  # The meeting id of the stage running in this process
+
+def _on_cancel_signal(signum, frame):
+    # The signal may come late, for a job this process has already handed on
+    if _current_job and job_status.get_state(_current_job) in job_status.STOPPED_STATES:
+        raise job_status.JobCancelled(f"Job {_current_job} was cancelled")
+
+def cancellable(stage):
+    """Decorates a job stage so cancelling the job skips it, or interrupts it while it runs."""
+    @functools.wraps(stage)
+    def wrapper(job):
+        global _current_job
+        signal.signal(CANCEL_SIGNAL, _on_cancel_signal)
+        _current_job = job["meeting_id"]
+        try:
+            # Recorded before checking the state, so a cancel either is seen here or signals this process
+            if job_status.set_worker(job["meeting_id"], os.getpid()) in job_status.STOPPED_STATES:
+                print(f"Job {job['meeting_id']} was cancelled.")
+                return None
+            return stage(job)
+        finally:
+            _current_job = None
+    return wrapper
@@ -0,0 +1,147 @@
+import os
+import re
+import sys
+import json
+from contextlib import closing
+import meeting_index
+import speech
+
+# Transcript segments are stored in a plain table and indexed by an external-content
+# FTS5 table kept in sync by triggers, so a meeting's rows can be deleted by its
+# indexed meeting_id instead of scanning the full-text index.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcript_segments (
+    id INTEGER PRIMARY KEY,
+    meeting_id TEXT NOT NULL,
+    start REAL,
+    text TEXT NOT NULL,
+    words TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcript_segments_by_meeting ON transcript_segments (meeting_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS transcript_fts USING fts5(
+    text, content='transcript_segments', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS transcript_segments_ai AFTER INSERT ON transcript_segments BEGIN
+    INSERT INTO transcript_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS transcript_segments_ad AFTER DELETE ON transcript_segments BEGIN
+    INSERT INTO transcript_fts (transcript_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+MAX_MATCHES = 200          # Best-ranked segments considered per query
+MATCHES_PER_MEETING = 3    # Snippets returned for each meeting
+
+_schema_ready = False
+
+def get_connection():
+    global _schema_ready
+    conn = meeting_index.get_connection()
+    if not _schema_ready:
+        conn.executescript(SCHEMA)
+        _schema_ready = True
+    return conn
+
+def _replace_segments(conn, meeting_id, transcript):
+    conn.execute("DELETE FROM transcript_segments WHERE meeting_id = ?", (meeting_id,))
+    conn.executemany(
+        "INSERT INTO transcript_segments (meeting_id, start, text, words) VALUES (?, ?, ?, ?)",
+        [(meeting_id, segment["start"], segment["text"], json.dumps(segment["words"]))
+         for segment in transcript["segments"]]
+    )
+
+def index_transcript(meeting_id, transcript):
+    """Replaces a meeting's entries in the full-text index with the given transcript."""
+    with closing(get_connection()) as conn, conn:
+        _replace_segments(conn, meeting_id, transcript)
+
+def remove_transcript(meeting_id):
+    with closing(get_connection()) as conn, conn:
+        conn.execute("DELETE FROM transcript_segments WHERE meeting_id = ?", (meeting_id,))
+
+def to_match_query(query):
+    """Turns free text into an FTS5 query matching all of its words, with no query syntax."""
+    terms = re.findall(r"\w+", query.lower())
+    return " ".join(f'"{term}"' for term in terms)
+
+def _match_offset(words, highlighted, default):
+    """Returns the start time of the first word FTS matched in a segment.
+
+    highlighted is the segment's text with matched tokens marked by \x01. FTS
+    decides what matched (with its own stemming), and the marked token's position
+    among the text's tokens picks the word.
+    """
+    before, marked, _ = highlighted.partition("\x01")
+    if not marked:
+        return default
+    remaining = len(re.findall(r"\w+", before))
+    for word in words:
+        remaining -= len(re.findall(r"\w+", word["word"]))
+        if remaining < 0:
+            return word["start"]
+    return default
+
+def search(query, limit=20):
+    """Returns meetings matching all words of the query, best match first.
+
+    Each meeting lists up to MATCHES_PER_MEETING snippets with the time offset
+    (in seconds) of the matching words.
+    """
+    match_query = to_match_query(query)
+    if not match_query:
+        return []
+    with closing(get_connection()) as conn:
+        rows = conn.execute(
+            "SELECT s.meeting_id, s.start, s.words, bm25(transcript_fts) AS score, "
+            "snippet(transcript_fts, 0, '[', ']', '...', 12) AS snippet, "
+            "highlight(transcript_fts, 0, char(1), char(2)) AS highlighted "
+            "FROM transcript_fts JOIN transcript_segments s ON s.id = transcript_fts.rowid "
+            "WHERE transcript_fts MATCH ? ORDER BY score LIMIT ?",
+            (match_query, MAX_MATCHES)
+        ).fetchall()
+
+        results = {}
+        for row in rows:
+            meeting = results.get(row['meeting_id'])
+            if meeting is None:
+                if len(results) == limit:
+                    continue
+                meeting = results[row['meeting_id']] = {
+                    "id": row['meeting_id'],
+                    "score": -row['score'], # bm25() is lower for better matches
+                    "matches": []
+                }
+            if len(meeting["matches"]) < MATCHES_PER_MEETING:
+                meeting["matches"].append({
+                    "start": row['start'],
+                    "offset": _match_offset(json.loads(row['words']), row['highlighted'], row['start']),
+                    "snippet": row['snippet']
+                })
+
+        if results:
+            placeholders = ",".join("?" * len(results))
+            for row in conn.execute(f"SELECT id, metadata FROM meetings WHERE id IN ({placeholders})", list(results)):
+                metadata = json.loads(row['metadata'])
+                results[row['id']]["name"] = metadata.get('name')
+                results[row['id']]["date"] = metadata.get('date')
+
+    return list(results.values())
+
+def rebuild_from_disk():
+    """Re-indexes every saved transcript in the transcripts directory."""
+    count = 0
+    with closing(get_connection()) as conn, conn:
+        conn.execute("DELETE FROM transcript_segments")
+        for meeting_id in os.listdir(meeting_index.TRANSCRIPTS_DIR):
+            meeting_path = os.path.join(meeting_index.TRANSCRIPTS_DIR, meeting_id)
+            transcript = speech.load_transcript(meeting_path) if os.path.isdir(meeting_path) else None
+            if transcript is not None:
+                _replace_segments(conn, meeting_id, transcript)
+                count += 1
+    return count
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python3 search_index.py rebuild")
+        sys.exit(1)
+    print(f"Indexed {rebuild_from_disk()} transcripts.")
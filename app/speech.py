@@ -0,0 +1,238 @@
+import os
+import json
+import math
+import wave
+import array
+import collections
+import threading
+import subprocess
+
+try:
+    import audioop # Fast RMS in C; removed from the standard library in Python 3.13
+except ImportError:
+    audioop = None
+
+TRANSCRIPT_FILENAME = "transcript.json"
+
+# Audio decoding
+SUPPORTED_EXTENSIONS = {".wav", ".m4a", ".mp3", ".ogg", ".opus", ".flac"}  # .opus/.flac: archived audio
+DECODE_RATE = 16000     # Sample rate ffmpeg resamples compressed audio to
+PCM_CHUNK_BYTES = 8000  # 4000 frames (0.25 s at 16 kHz) per read, as Vosk is usually fed
+FFMPEG_ERROR_LINES = 20 # Last lines of ffmpeg's error output kept for the failure message
+
+# Silence detection used to split audio for parallel transcription
+VAD_FRAME_SECONDS = 0.03     # Energy is measured over 30 ms frames
+SILENCE_RMS = 300            # Frames quieter than this (16-bit RMS) count as silence
+SILENCE_SECONDS = 0.3        # A pause must be at least this long to split on
+MIN_SEGMENT_SECONDS = 15     # Don't split more often than this, so Vosk keeps some context
+MAX_SEGMENT_SECONDS = 60     # Force a split in audio that never goes quiet
+
+class TranscriptBuilder:
+    """Collects the JSON results of a Vosk recognizer into a structured transcript.
+
+    Each final recognizer result becomes one segment holding its text, start/end
+    time and the per-word timestamps produced by SetWords(True).
+    """
+
+    def __init__(self, offset=0.0):
+        self.offset = offset  # Start of this audio in the full recording, in seconds
+        self.segments = []
+
+    def add_result(self, result_json):
+        result = json.loads(result_json)
+        text = result.get("text", "")
+        if not text:
+            return
+        words = result.get("result", [])
+        if self.offset:
+            words = [dict(word, start=word["start"] + self.offset, end=word["end"] + self.offset) for word in words]
+        self.segments.append({
+            "start": words[0]["start"] if words else None,
+            "end": words[-1]["end"] if words else None,
+            "text": text,
+            "words": words
+        })
+
+    def feed(self, rec, data):
+        """Passes PCM data to the recognizer, keeping any completed utterance."""
+        if rec.AcceptWaveform(data):
+            self.add_result(rec.Result())
+
+    def finish(self, rec):
+        """Flushes the recognizer and returns the finished transcript."""
+        self.add_result(rec.FinalResult())
+        return self.transcript()
+
+    def transcript(self):
+        return {
+            "text": " ".join(segment["text"] for segment in self.segments),
+            "segments": self.segments
+        }
+
+def _iter_wav(wf):
+    with wf:
+        while True:
+            data = wf.readframes(PCM_CHUNK_BYTES // 2)
+            if not data:
+                break
+            yield data
+
+def _feed_stdin(proc, source, errors):
+    try:
+        for data in source:
+            proc.stdin.write(data)
+    except BrokenPipeError:
+        pass # ffmpeg exited; its exit status reports why
+    except Exception as e:
+        errors.append(e)
+    finally:
+        proc.stdin.close()
+
+def _drain_stderr(proc, tail):
+    # Read continuously so ffmpeg never blocks on a full stderr pipe; keep only the end for the error message
+    for line in proc.stderr:
+        tail.append(line)
+
+def _iter_ffmpeg(filepath, source=None):
+    # With a source iterator the encoded file is piped into ffmpeg's stdin instead
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0" if source else filepath,
+           "-f", "s16le", "-ac", "1", "-ar", str(DECODE_RATE), "-"]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if source else None,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    feeder_errors = []
+    if source:
+        threading.Thread(target=_feed_stdin, args=(proc, source, feeder_errors), daemon=True).start()
+    stderr_tail = collections.deque(maxlen=FFMPEG_ERROR_LINES)
+    stderr_reader = threading.Thread(target=_drain_stderr, args=(proc, stderr_tail), daemon=True)
+    stderr_reader.start()
+    try:
+        while True:
+            data = proc.stdout.read(PCM_CHUNK_BYTES)
+            if not data:
+                break
+            yield data
+        stderr_reader.join()
+        stderr = b"".join(stderr_tail).decode(errors="replace")
+        if feeder_errors:
+            raise feeder_errors[0]
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {os.path.basename(filepath)}: {stderr.strip()}")
+    finally:
+        # The consumer may stop early (e.g. on an error); don't leave ffmpeg running
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        stderr_reader.join()
+        proc.stdout.close()
+        proc.stderr.close()
+
+def open_pcm_stream(filepath, source=None):
+    """Opens an audio file as a stream of 16-bit mono PCM chunks.
+
+    Returns (rate, chunks). Mono 16-bit WAVs are read directly; anything else is
+    decoded by an ffmpeg subprocess piping raw PCM, so memory use does not depend
+    on the length of the file and decoding overlaps with whatever consumes the chunks.
+    If source is given, the file's bytes are taken from that iterator instead of
+    from disk (e.g. an upload that is still arriving).
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise TypeError(f"Unsupported audio format: {extension}")
+
+    if source is not None:
+        return DECODE_RATE, _iter_ffmpeg(filepath, source)
+
+    if extension == ".wav":
+        wf = wave.open(filepath, "rb")
+        if wf.getnchannels() == 1 and wf.getsampwidth() == 2 and wf.getcomptype() == "NONE":
+            return wf.getframerate(), _iter_wav(wf)
+        wf.close()
+    return DECODE_RATE, _iter_ffmpeg(filepath)
+
+def get_duration(filepath):
+    """Returns the length of an audio file in seconds, or None if it can't be determined."""
+    if os.path.splitext(filepath)[1].lower() == ".wav":
+        try:
+            with wave.open(filepath, "rb") as wf:
+                return wf.getnframes() / wf.getframerate()
+        except (wave.Error, EOFError):
+            pass # Not PCM (e.g. float samples) or not really a WAV; ffprobe may still read it
+    try:
+        output = subprocess.check_output(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", filepath], text=True)
+        return float(output.strip())
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return None
+
+def track_progress(chunks, rate, duration, on_progress):
+    """Passes chunks through, calling on_progress(fraction, seconds) with the audio consumed so far."""
+    total_bytes = duration * rate * 2 if duration else None
+    consumed = 0
+    for chunk in chunks:
+        yield chunk
+        consumed += len(chunk)
+        on_progress(consumed / total_bytes if total_bytes else None, consumed / (rate * 2))
+
+def frame_rms(frame):
+    """Returns the RMS energy of a frame of 16-bit mono PCM."""
+    if audioop:
+        return audioop.rms(frame, 2)
+    samples = array.array("h", frame)
+    if not samples:
+        return 0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+def iter_pcm_segments(chunks, rate):
+    """Splits a stream of 16-bit mono PCM chunks at pauses in speech.
+
+    Yields (start_sample, pcm_bytes) tuples in order. Segments are cut in the middle
+    of a silence so no word is split between two recognizers. Only the segment
+    being built is held in memory.
+    """
+    frame_bytes = int(rate * VAD_FRAME_SECONDS) * 2
+    min_bytes = int(rate * MIN_SEGMENT_SECONDS) * 2
+    max_bytes = int(rate * MAX_SEGMENT_SECONDS) * 2
+    silence_frames = math.ceil(SILENCE_SECONDS / VAD_FRAME_SECONDS)
+
+    pending = bytearray()
+    segment = bytearray()
+    segment_start = 0
+    silent_run = 0
+    for chunk in chunks:
+        pending += chunk
+        offset = 0
+        while len(pending) - offset >= frame_bytes:
+            frame = bytes(pending[offset:offset + frame_bytes])
+            offset += frame_bytes
+            segment += frame
+            silent_run = silent_run + 1 if frame_rms(frame) < SILENCE_RMS else 0
+
+            if len(segment) >= min_bytes and silent_run >= silence_frames:
+                cut = len(segment) - (silent_run // 2) * frame_bytes
+            elif len(segment) >= max_bytes:
+                cut = len(segment)
+            else:
+                continue
+            yield segment_start, bytes(segment[:cut])
+            segment_start += cut // 2
+            segment = segment[cut:]
+            silent_run = 0
+        del pending[:offset]
+
+    segment += pending
+    if segment:
+        yield segment_start, bytes(segment)
+
+def save_transcript(meeting_path, transcript):
+    """Writes a transcript next to the meeting's audio."""
+    with open(os.path.join(meeting_path, TRANSCRIPT_FILENAME), 'w') as f:
+        json.dump(transcript, f)
+
+def load_transcript(meeting_path):
+    """Returns the meeting's saved transcript, or None if it has not been transcribed yet."""
+    transcript_path = os.path.join(meeting_path, TRANSCRIPT_FILENAME)
+    if not os.path.exists(transcript_path):
+        return None
+    with open(transcript_path, 'r') as f:
+        return json.load(f)
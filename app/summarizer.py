@@ -0,0 +1,227 @@
+import os
+import json
+import hashlib
+import multiprocessing
+
+# --- Configuration ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BASE_DIR)
+
+SUMMARY_CACHE_DIR = os.path.join(PROJECT_ROOT, "cache", "summaries")  # One file per LLM call
+ANALYSIS_CACHE_DIR = os.path.join(PROJECT_ROOT, "cache", "analyses")  # One file per analyzed transcript
+
+# Transcript tokens per window. Leaves room in TinyLlama's 2048-token context
+# for the prompt itself and the generated summary.
+WINDOW_TOKENS = 1200
+# Words tokenized per call when packing a transcript into windows. Windows are
+# cut at these boundaries, so this must stay well below WINDOW_TOKENS.
+PIECE_WORDS = 100
+MAX_NEW_TOKENS = 256
+TEMPERATURE = 0.7
+# Settings passed to every LLM call. threads and batch_size (prompt tokens
+# evaluated per step) override the values the model was loaded with; None keeps them.
+GENERATION_SETTINGS = {
+    "max_new_tokens": MAX_NEW_TOKENS,
+    "temperature": TEMPERATURE,
+    "threads": None,
+    "batch_size": None
+}
+# Bump when the prompts or the map-reduce change, so cached analyses aren't reused
+PROMPT_VERSION = 2
+
+ANALYSIS_PROMPT = """
+    Analyze the following transcript. Provide a concise one-paragraph summary and then list the top 3-5 key points as a bulleted list.
+
+    Transcript:
+    "{text}"
+
+    Analysis:
+    """
+
+MAP_PROMPT = """
+    Summarize the following part of a meeting transcript in a few sentences. Keep names, decisions and action items.
+
+    Transcript excerpt:
+    "{text}"
+
+    Summary:
+    """
+
+REDUCE_PROMPT = """
+    The following are summaries of consecutive parts of one meeting. Provide a concise one-paragraph summary of the whole meeting and then list the top 3-5 key points as a bulleted list.
+
+    Part summaries:
+    {text}
+
+    Analysis:
+    """
+
+class AnalysisProgress:
+    """Counts finished LLM calls and generated tokens for a progress callback.
+
+    on_progress(fraction, tokens) is called after every token and every finished call.
+    """
+
+    def __init__(self, on_progress, total_calls):
+        self.on_progress = on_progress
+        self.total_calls = total_calls
+        self.calls_done = 0
+        self.tokens = 0
+
+    def token(self, token=None):
+        self.tokens += 1
+        self.on_progress(self.calls_done / self.total_calls, self.tokens)
+
+    def call_done(self, tokens=0):
+        self.calls_done = min(self.calls_done + 1, self.total_calls)
+        self.tokens += tokens
+        self.on_progress(self.calls_done / self.total_calls, self.tokens)
+
+def _settings(settings):
+    """Returns the call keyword arguments for a settings dict, leaving out unset values."""
+    return {name: value for name, value in settings.items() if value is not None}
+
+def generate(llm, prompt, on_token=None, settings=None):
+    """Runs the LLM on a prompt with GENERATION_SETTINGS, updated by settings.
+
+    With on_token, the output is streamed and on_token(token) is called for each
+    token as it is generated. Returns the full output.
+    """
+    kwargs = _settings(dict(GENERATION_SETTINGS, **(settings or {})))
+    if on_token is None:
+        return llm(prompt, **kwargs)
+    output = ""
+    for token in llm(prompt, stream=True, **kwargs):
+        output += token
+        on_token(token)
+    return output
+
+def _settings_key():
+    # threads and batch_size change speed, not output
+    return {name: value for name, value in GENERATION_SETTINGS.items() if name not in ("threads", "batch_size")}
+
+def _read_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, 'r') as f:
+        return f.read()
+
+def _write_cache(cache_path, output):
+    # Write atomically; other workers may be reading the cache at the same time
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(output)
+    os.replace(tmp_path, cache_path)
+
+def cached_generate(llm, prompt, model_name, progress=None):
+    """Runs the LLM on a prompt, reusing the stored output if this exact prompt was run before.
+
+    With a progress tracker, tokens are streamed so each one can be reported.
+    """
+    key_source = json.dumps([model_name, _settings_key(), prompt])
+    cache_path = os.path.join(SUMMARY_CACHE_DIR, f"{hashlib.sha256(key_source.encode()).hexdigest()}.txt")
+    output = _read_cache(cache_path)
+    if output is None:
+        output = generate(llm, prompt, progress.token if progress else None)
+        _write_cache(cache_path, output)
+    if progress:
+        progress.call_done()
+    return output
+
+def split_words(text, words_per_piece=PIECE_WORDS):
+    """Splits text into pieces of words_per_piece words, so it can be tokenized a piece at a time."""
+    words = text.split()
+    return [" ".join(words[index:index + words_per_piece]) for index in range(0, len(words), words_per_piece)]
+
+def pack_windows(llm, pieces, budget, separator):
+    """Greedily joins consecutive pieces of text into windows of at most budget tokens."""
+    windows = []
+    current = []
+    used = 0
+    for piece in pieces:
+        tokens = len(llm.tokenize(piece))
+        if current and used + tokens > budget:
+            windows.append(separator.join(current))
+            current = []
+            used = 0
+        current.append(piece)
+        used += tokens
+    if current:
+        windows.append(separator.join(current))
+    return windows
+
+# State for forked map processes; set by the pool initializer
+_pool_llm = None
+_pool_model_name = None
+
+def _init_map_process(llm, model_name):
+    global _pool_llm, _pool_model_name
+    _pool_llm = llm
+    _pool_model_name = model_name
+
+def _summarize_window(window):
+    return cached_generate(_pool_llm, MAP_PROMPT.format(text=window), _pool_model_name)
+
+def summarize_windows(llm, model_name, windows, processes, progress=None):
+    """Summarizes each window, on a process pool when more than one process is allowed."""
+    if processes <= 1 or len(windows) <= 1:
+        return [cached_generate(llm, MAP_PROMPT.format(text=window), model_name, progress) for window in windows]
+    # With fork the initializer arguments are inherited, so the model is shared rather than pickled
+    ctx = multiprocessing.get_context("fork")
+    summaries = []
+    with ctx.Pool(min(processes, len(windows)), initializer=_init_map_process, initargs=(llm, model_name)) as pool:
+        for summary in pool.imap(_summarize_window, windows):
+            summaries.append(summary)
+            if progress:
+                # Pool processes don't stream; count each summary's tokens as it arrives
+                progress.call_done(len(llm.tokenize(summary)))
+    return summaries
+
+def analysis_cache_path(text, model_name):
+    """Returns where the analysis of a transcript is cached.
+
+    The key is the transcript's hash plus everything else that shapes the output:
+    the model, the prompt version, the generation settings and the window size.
+    """
+    version = hashlib.sha256(json.dumps([model_name, PROMPT_VERSION, _settings_key(), WINDOW_TOKENS]).encode())
+    transcript_hash = hashlib.sha256(text.encode()).hexdigest()
+    return os.path.join(ANALYSIS_CACHE_DIR, version.hexdigest()[:16], f"{transcript_hash}.txt")
+
+def analyze(llm, text, model_name, processes=1, on_progress=None):
+    """Summarizes a transcript of any length with a map-reduce over token-budgeted windows.
+
+    A transcript that fits in one window is analyzed in a single pass. Longer ones
+    are summarized window by window, and the partial summaries are reduced
+    (repeatedly, if they still don't fit) into the final analysis. A transcript
+    analyzed before is answered from the analysis cache without touching the LLM,
+    and every LLM call is cached by content hash too, so a retried job skips the
+    windows it already finished.
+
+    on_progress(fraction, tokens_generated) is called as the analysis advances.
+    """
+    cache_path = analysis_cache_path(text, model_name)
+    analysis = _read_cache(cache_path)
+    if analysis is None:
+        analysis = _analyze(llm, text, model_name, processes, on_progress)
+        _write_cache(cache_path, analysis)
+    elif on_progress:
+        on_progress(1.0, 0)
+    return analysis
+
+def _analyze(llm, text, model_name, processes, on_progress):
+    # One tokenize call per piece rather than per word; each is a model server round trip
+    windows = pack_windows(llm, split_words(text), WINDOW_TOKENS, " ")
+    # One call per window plus the final reduce; extra reduce levels are rare enough to ignore
+    progress = AnalysisProgress(on_progress, len(windows) + 1 if len(windows) > 1 else 1) if on_progress else None
+    if len(windows) <= 1:
+        return cached_generate(llm, ANALYSIS_PROMPT.format(text=text), model_name, progress)
+
+    level = 1
+    while True:
+        print(f"Summarizing {len(windows)} windows (level {level})...")
+        summaries = [summary.strip() for summary in summarize_windows(llm, model_name, windows, processes, progress)]
+        windows = pack_windows(llm, summaries, WINDOW_TOKENS, "\n\n")
+        if len(windows) == 1:
+            return cached_generate(llm, REDUCE_PROMPT.format(text=windows[0]), model_name, progress)
+        level += 1
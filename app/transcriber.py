@@ -5,7 +5,14 @@ import time
 import os
 import uuid
 import json
+import queue
+import threading
 from datetime import datetime
+import speech
+import model_client
+import meeting_index
+import scheduler
+import metrics
 
 # --- Configuration ---
 SWITCH_PIN = 23
@@ -13,14 +20,31 @@ LED_PIN = 24
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-JOB_QUEUE_DIR = os.path.join(os.path.dirname(BASE_DIR), "job_queue")
-
 # PyAudio settings
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 16000
 CHUNK = 1024
+SAMPLE_WIDTH = pyaudio.get_sample_size(FORMAT)
+
+# The input stream stays open between recordings and PortAudio's callback copies
+# every buffer into a preallocated ring buffer, so capture never waits on the
+# disk, GPIO polling or a busy CPU. A writer thread drains the ring to the WAV
+# file (and live transcription) while recording; when idle, the ring keeps the
+# last PRE_ROLL_SECONDS so the words spoken as the switch is pressed are kept.
+RING_SECONDS = 30        # Audio the ring holds; the writer may fall this far behind before audio is lost
+PRE_ROLL_SECONDS = 3     # Audio from before the switch press included at the start of a recording
+WRITER_INTERVAL = 0.1    # Seconds between writer flushes
+SWITCH_POLL_INTERVAL = 0.05  # Seconds between checks of the switch while recording
+
+# Live transcription: feed the recognizer while the switch is still held. It runs
+# on the worker's model server, so the recorder holds no model of its own; when
+# the server is not running, the worker transcribes the saved WAV instead.
+LIVE_TRANSCRIPTION = True
+LIVE_CONNECT_TIMEOUT = 2  # Seconds to wait for the model server when a recording starts
+# Chunks the recognizer may fall behind by (~64s of audio) before live transcription
+# is abandoned and the worker transcribes the saved WAV instead
+LIVE_QUEUE_CHUNKS = 1000
 
 # --- GPIO Setup ---
 GPIO.setmode(GPIO.BCM)
@@ -36,29 +60,165 @@ def blink_led(duration, interval=0.1):
         GPIO.output(LED_PIN, GPIO.LOW)
         time.sleep(interval)
 
-def record_audio():
-    """Records audio while the switch is active and saves it to the job queue."""
-    audio = pyaudio.PyAudio()
-    stream = audio.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
-    
-    print("Recording started...")
-    frames = []
-    
-    # Start LED blinking
-    GPIO.output(LED_PIN, GPIO.HIGH)
+class LiveTranscriber:
+    """Runs a recognizer on the model server from a background thread, over chunks fed from the recorder."""
 
-    while GPIO.input(SWITCH_PIN) == GPIO.LOW: # Assuming switch pulls to ground when active
-        data = stream.read(CHUNK)
-        frames.append(data)
+    def __init__(self, model):
+        self.model = model
+        self.rec = None
+        self.builder = speech.TranscriptBuilder()
+        self.chunks = queue.Queue(maxsize=LIVE_QUEUE_CHUNKS)
+        self.abandoned = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
 
-    # Stop LED
-    GPIO.output(LED_PIN, GPIO.LOW)
-    print("Recording stopped.")
+    def _run(self):
+        # Connecting happens here, so a missing model server never delays the recording
+        try:
+            self.rec = model_client.KaldiRecognizer(self.model, RATE)
+            self.rec.SetWords(True)
+            while True:
+                data = self.chunks.get()
+                if data is None:
+                    break
+                self.builder.feed(self.rec, data)
+        except (model_client.ModelServerError, OSError, EOFError) as e:
+            print(f"Live transcription stopped ({e}); the worker will transcribe the recording instead.")
+            self.abandoned = True
+            while self.chunks.get() is not None:
+                pass # Drained until finish(), which may be waiting to queue its marker
+
+    def feed(self, data):
+        """Queues a chunk without ever blocking the recording loop."""
+        if self.abandoned:
+            return
+        try:
+            self.chunks.put_nowait(data)
+        except queue.Full:
+            print("Live transcription fell behind; the worker will transcribe the recording instead.")
+            self.abandoned = True
+
+    def finish(self):
+        """Waits for the queued audio to be recognized. Returns the transcript, or None if incomplete."""
+        self.chunks.put(None)
+        self.thread.join()
+        if self.abandoned:
+            return None
+        try:
+            return self.builder.finish(self.rec)
+        except (model_client.ModelServerError, OSError, EOFError) as e:
+            print(f"Live transcription stopped ({e}); the worker will transcribe the recording instead.")
+            return None
+
+class RingBuffer:
+    """A fixed-size byte ring that one thread writes and another reads by absolute position.
+
+    Positions count every byte ever written, so a reader that fell more than the
+    capacity behind can tell how much audio was overwritten before it read it.
+    """
+
+    def __init__(self, capacity):
+        self.buffer = bytearray(capacity)
+        self.capacity = capacity
+        self.written = 0
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        skipped = max(0, len(data) - self.capacity) # Only the end of an oversized write fits
+        data = memoryview(data)[skipped:]
+        with self.lock:
+            self.written += skipped
+            start = self.written % self.capacity
+            first = min(len(data), self.capacity - start)
+            self.buffer[start:start + first] = data[:first]
+            self.buffer[:len(data) - first] = data[first:]
+            self.written += len(data)
+
+    def read(self, position):
+        """Returns (data written since position, bytes lost because they were already overwritten)."""
+        with self.lock:
+            end = self.written
+            start = max(position, end - self.capacity)
+            first = start % self.capacity
+            if first + (end - start) <= self.capacity:
+                data = bytes(self.buffer[first:first + end - start])
+            else:
+                data = bytes(self.buffer[first:]) + bytes(self.buffer[:(end - start) - (self.capacity - first)])
+        return data, start - position
+
+class Recorder:
+    """Captures audio continuously with a PortAudio callback, keeping a pre-roll in a ring buffer."""
+
+    def __init__(self):
+        frame_bytes = CHANNELS * SAMPLE_WIDTH
+        self.ring = RingBuffer(int(RING_SECONDS * RATE) * frame_bytes)
+        self.pre_roll_bytes = int(PRE_ROLL_SECONDS * RATE) * frame_bytes
+        self.data_ready = threading.Event()
+        self.device_overflows = 0
+        self.capturing = False
+        self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True,
+                                      frames_per_buffer=CHUNK, stream_callback=self._callback)
+
+    def _callback(self, in_data, frame_count, time_info, status_flags):
+        # Runs on PortAudio's thread: only copy and count, never block
+        if status_flags & pyaudio.paInputOverflow and self.capturing:
+            self.device_overflows += 1
+        self.ring.write(in_data)
+        self.data_ready.set()
+        return (None, pyaudio.paContinue)
 
-    stream.stop_stream()
-    stream.close()
-    audio.terminate()
+    def start(self, wf, live=None):
+        """Starts writing to wf, beginning with the pre-roll, until stop() is called."""
+        self.wf = wf
+        self.live = live
+        self.device_overflows = 0
+        self.lost_bytes = 0
+        self.stopping = threading.Event()
+        with self.ring.lock:
+            self.position = max(0, self.ring.written - self.pre_roll_bytes)
+        self.capturing = True
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
 
+    def _flush(self):
+        data, lost = self.ring.read(self.position)
+        self.position += lost + len(data)
+        self.lost_bytes += lost
+        if not data:
+            return
+        self.wf.writeframes(data)
+        if self.live:
+            for offset in range(0, len(data), CHUNK * SAMPLE_WIDTH):
+                self.live.feed(data[offset:offset + CHUNK * SAMPLE_WIDTH])
+
+    def _write_loop(self):
+        while not self.stopping.is_set():
+            self.data_ready.wait(WRITER_INTERVAL)
+            self.data_ready.clear()
+            self._flush()
+        self._flush() # Everything captured up to stop()
+
+    def stop(self):
+        """Stops writing once the captured audio is flushed. Returns (device overflows, seconds of audio lost)."""
+        self.capturing = False
+        self.stopping.set()
+        self.writer.join()
+        return self.device_overflows, self.lost_bytes / (RATE * CHANNELS * SAMPLE_WIDTH)
+
+    def close(self):
+        self.stream.stop_stream()
+        self.stream.close()
+        self.audio.terminate()
+
+def record_audio(recorder, live_model=None):
+    """Records audio while the switch is active and saves it to the job queue.
+
+    The recording starts PRE_ROLL_SECONDS before the switch press and is written
+    to the meeting directory as it is captured, so memory use does not grow with
+    the length of the recording. When a model is given, the audio is also
+    transcribed live and the worker only has to run the analysis.
+    """
     # --- Create a proper meeting structure, same as web upload ---
     # 1. Create a new meeting structure
     meeting_id = f"{uuid.uuid4().hex}"
@@ -66,15 +226,51 @@ def record_audio():
     meeting_path = os.path.join(transcripts_dir, meeting_id)
     os.makedirs(os.path.join(meeting_path, 'attachments'), exist_ok=True)
 
-    # 2. Save the audio file
+    # 2. Stream the audio file to disk while recording
     now = datetime.now()
     audio_basename = f"rec_{now.strftime('%Y%m%d_%H%M%S')}.wav"
     audio_path = os.path.join(meeting_path, audio_basename)
-    with wave.open(audio_path, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(audio.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
+    wf = wave.open(audio_path, 'wb')
+    wf.setnchannels(CHANNELS)
+    wf.setsampwidth(SAMPLE_WIDTH)
+    wf.setframerate(RATE)
+
+    live = LiveTranscriber(live_model) if live_model is not None else None
+    recorder.start(wf, live)
+
+    print("Recording started...")
+    
+    # Start LED blinking
+    GPIO.output(LED_PIN, GPIO.HIGH)
+
+    while GPIO.input(SWITCH_PIN) == GPIO.LOW: # Assuming switch pulls to ground when active
+        time.sleep(SWITCH_POLL_INTERVAL)
+
+    # Stop LED
+    GPIO.output(LED_PIN, GPIO.LOW)
+    print("Recording stopped.")
+
+    device_overflows, lost_seconds = recorder.stop()
+    recorded_seconds = wf.getnframes() / RATE
+    wf.close()
+
+    # Written once per recording, so the recording loop never waits on the database
+    metrics.inc("transcriber_recorded_seconds_total", recorded_seconds)
+    if device_overflows:
+        print(f"Warning: {device_overflows} input overflows while recording.")
+        metrics.inc("transcriber_recorder_overruns_total", device_overflows, source="device")
+    if lost_seconds:
+        print(f"Warning: the writer fell behind and {lost_seconds:.1f}s of audio was lost.")
+        metrics.inc("transcriber_recorder_overruns_total", source="ring_buffer")
+        metrics.inc("transcriber_recorder_lost_seconds_total", lost_seconds)
+
+    if live:
+        transcript = live.finish()
+        if transcript is not None:
+            speech.save_transcript(meeting_path, transcript)
+            print("Live transcript saved.")
+        else:
+            metrics.inc("transcriber_live_transcription_abandoned_total")
     
     # 3. Create metadata.json
     metadata = {
@@ -84,24 +280,35 @@ def record_audio():
     }
     with open(os.path.join(meeting_path, 'metadata.json'), 'w') as f:
         json.dump(metadata, f, indent=2)
+    meeting_index.upsert_meeting(meeting_id, metadata)
 
-    # 4. Create a job file in the queue
-    os.makedirs(JOB_QUEUE_DIR, exist_ok=True)
-    with open(os.path.join(JOB_QUEUE_DIR, f"{meeting_id}.job"), 'w') as f:
-        f.write(meeting_id)
+    # 4. Create a job file in the queue; recordings from the switch go ahead of uploads
+    scheduler.enqueue(meeting_id, audio_path, source="recorder")
 
     print(f"Created job {meeting_id} for recording {audio_basename}")
 
+def load_live_model():
+    """Returns the model server's Vosk model for live transcription, or None if it is disabled.
+
+    Nothing is loaded here; each recording connects to the server when it starts.
+    """
+    if not LIVE_TRANSCRIPTION:
+        return None
+    return model_client.Model(connect_timeout=LIVE_CONNECT_TIMEOUT)
+
 if __name__ == "__main__":
+    live_model = load_live_model()
+    recorder = Recorder() # Capturing from now on, so the pre-roll is always armed
     print("Hardware listener started. Waiting for switch...")
     try:
         while True:
             # Wait for the switch to be activated (pulled to LOW)
             GPIO.wait_for_edge(SWITCH_PIN, GPIO.FALLING)
-            time.sleep(0.2) # Debounce
-            record_audio()
+            time.sleep(0.2) # Debounce; the pre-roll covers the audio captured meanwhile
+            record_audio(recorder, live_model)
             time.sleep(0.5) # Wait a bit before listening for the next press
     except KeyboardInterrupt:
         print("Exiting hardware listener.")
     finally:
+        recorder.close()
         GPIO.cleanup()
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+
+UPLOAD_STATE_FILENAME = "upload.json"
+PART_SUFFIX = ".part"
+WRITE_BUFFER_SIZE = 1024 * 1024  # Bytes read from the request and written to disk at a time
+TAIL_POLL_INTERVAL = 0.5         # Seconds between checks for new data in an upload being decoded
+UPLOAD_IDLE_TIMEOUT = 10 * 60    # Seconds without new data before an upload being decoded is given up on
+
+# M4A files usually keep their index at the end, so they can't be decoded before they are complete
+EARLY_DECODE_EXTENSIONS = {".wav", ".mp3", ".ogg"}
+
+class UploadError(Exception):
+    """An upload request that can't be applied. status is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+def part_path(meeting_path, audio_filename):
+    return os.path.join(meeting_path, audio_filename + PART_SUFFIX)
+
+def can_decode_early(audio_filename):
+    return os.path.splitext(audio_filename)[1].lower() in EARLY_DECODE_EXTENSIONS
+
+def create_upload(meeting_path, audio_filename, size, sha256, name, date):
+    """Starts a resumable upload into an existing meeting directory."""
+    state = {
+        "audio_filename": audio_filename,
+        "size": size,
+        "sha256": sha256.lower() if sha256 else None,
+        "name": name,
+        "date": date
+    }
+    open(part_path(meeting_path, audio_filename), 'wb').close()
+    with open(os.path.join(meeting_path, UPLOAD_STATE_FILENAME), 'w') as f:
+        json.dump(state, f, indent=2)
+    return state
+
+def load_state(meeting_path):
+    """Returns the state of an unfinished upload, or None if there is none."""
+    state_path = os.path.join(meeting_path, UPLOAD_STATE_FILENAME)
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, 'r') as f:
+        return json.load(f)
+
+def current_offset(meeting_path, state):
+    """Returns how many bytes of the upload have been received."""
+    return os.path.getsize(part_path(meeting_path, state["audio_filename"]))
+
+def append_chunk(meeting_path, state, offset, stream, sha256=None):
+    """Appends the body of a chunk request at offset, streaming it to disk.
+
+    The offset must equal the bytes received so far, so a client that lost track
+    (e.g. after a dropped connection) gets a 409 with the offset to resume from.
+    If sha256 is given, a chunk that doesn't match it is dropped with a 422, so
+    the client resends just that chunk. Returns the new offset.
+    """
+    with open(part_path(meeting_path, state["audio_filename"]), 'ab') as f:
+        # Serialize concurrent requests for the same upload
+        fcntl.flock(f, fcntl.LOCK_EX)
+        received = f.seek(0, os.SEEK_END)
+        if offset != received:
+            raise UploadError(f"Expected offset {received}.", 409, received)
+        digest = hashlib.sha256()
+        while True:
+            data = stream.read(WRITE_BUFFER_SIZE)
+            if not data:
+                break
+            if received + len(data) > state["size"]:
+                f.truncate(offset) # Drop the partial chunk so the client can retry it
+                raise UploadError("Chunk extends past the declared file size.", 413, offset)
+            f.write(data)
+            digest.update(data)
+            received += len(data)
+        if sha256 and digest.hexdigest() != sha256.lower():
+            f.truncate(offset)
+            raise UploadError("Chunk checksum mismatch.", 422, offset)
+        return received
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(WRITE_BUFFER_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def finalize(meeting_path, state):
+    """Verifies the upload's size and checksum and moves it into place as the meeting audio.
+
+    On a checksum mismatch the received data is discarded, since the corrupt
+    chunk can't be located.
+    """
+    path = part_path(meeting_path, state["audio_filename"])
+    received = current_offset(meeting_path, state)
+    if received != state["size"]:
+        raise UploadError(f"Upload incomplete: {received} of {state['size']} bytes received.", 409, received)
+    if state["sha256"] and file_sha256(path) != state["sha256"]:
+        open(path, 'wb').close()
+        raise UploadError("Checksum mismatch. The upload has been reset.", 422, 0)
+
+    os.rename(path, os.path.join(meeting_path, state["audio_filename"]))
+    os.remove(os.path.join(meeting_path, UPLOAD_STATE_FILENAME))
+
+def iter_growing_upload(meeting_path, audio_filename):
+    """Yields the bytes of an upload while it is still arriving.
+
+    Ends once finalize() has moved the file into place. Raises if the upload is
+    aborted or reset, so a job decoding it early fails instead of using bad data,
+    and if no data arrives for UPLOAD_IDLE_TIMEOUT, so an abandoned upload
+    doesn't hold up the worker forever.
+    """
+    path = part_path(meeting_path, audio_filename)
+    final_path = os.path.join(meeting_path, audio_filename)
+    last_data = time.monotonic()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(WRITE_BUFFER_SIZE)
+            if data:
+                last_data = time.monotonic()
+                yield data
+                continue
+            if os.path.exists(final_path):
+                # Finalized; the open file is the same inode, so just drain it
+                for data in iter(lambda: f.read(WRITE_BUFFER_SIZE), b""):
+                    yield data
+                return
+            if not os.path.exists(path) or os.path.getsize(path) < f.tell():
+                raise RuntimeError(f"Upload of {audio_filename} was aborted or reset.")
+            if time.monotonic() - last_data > UPLOAD_IDLE_TIMEOUT:
+                raise RuntimeError(f"Upload of {audio_filename} received no data for {UPLOAD_IDLE_TIMEOUT}s.")
+            time.sleep(TAIL_POLL_INTERVAL)
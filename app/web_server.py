@@ -2,9 +2,23 @@ import os
 import uuid
 import json
 import re
+import time
+import mimetypes
+import threading
 import subprocess
-from flask import Flask, jsonify, request, send_from_directory, abort
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import Flask, Response, jsonify, request, send_from_directory, abort
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from urllib.parse import quote
+import meeting_index
+import search_index
+import job_status
+import uploads
+import archive
+import metrics
+import reports
+import scheduler
 
 app = Flask(__name__)
 
@@ -15,10 +29,26 @@ PROJECT_ROOT = os.path.dirname(BASE_DIR)
 TRANSCRIPTS_DIR = os.path.join(PROJECT_ROOT, "transcripts")
 JOB_QUEUE_DIR = os.path.join(PROJECT_ROOT, "job_queue")
 ALLOWED_EXTENSIONS = {'wav', 'm4a', 'mp3', 'ogg'}
+# Queue resumable uploads when they start, so decoding begins while chunks are still arriving
+EARLY_DECODE_UPLOADS = False
+EVENTS_POLL_INTERVAL = 1  # Seconds between checks for job status changes in /api/events
+EVENTS_KEEPALIVE = 15     # Seconds between keep-alive comments on an idle event stream
+# Downloads are authorized here and then sent by nginx from this internal location
+# (see nginx.conf), which also handles Range requests for seeking
+X_ACCEL_REDIRECT = True
+X_ACCEL_PREFIX = "/protected-transcripts/"
+
+# Archived audio formats (see archive.py), which mimetypes doesn't know everywhere
+mimetypes.add_type('audio/ogg', '.opus')
+mimetypes.add_type('audio/flac', '.flac')
 
 os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
 os.makedirs(JOB_QUEUE_DIR, exist_ok=True)
+meeting_index.rebuild_if_missing()
 WPA_SUPPLICANT_CONF = "/etc/wpa_supplicant/wpa_supplicant.conf"
+WIFI_SCAN_TTL = 30        # Seconds a Wi-Fi scan result is reused
+WIFI_STATUS_TTL = 5       # Seconds a Wi-Fi status result is reused
+WIFI_COMMAND_TIMEOUT = 30 # Seconds before a Wi-Fi subprocess is given up on
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -27,30 +57,83 @@ def get_meeting_path(meeting_id):
     """Constructs the path to a meeting directory."""
     return os.path.join(TRANSCRIPTS_DIR, meeting_id)
 
+def save_metadata(meeting_id, metadata):
+    """Writes a meeting's metadata.json and updates the meeting index."""
+    with open(os.path.join(get_meeting_path(meeting_id), 'metadata.json'), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    meeting_index.upsert_meeting(meeting_id, metadata)
+
+def queue_job(meeting_id):
+    """Creates a job file in the queue for the worker, prioritized by the length of its audio."""
+    with open(os.path.join(get_meeting_path(meeting_id), 'metadata.json'), 'r') as f:
+        audio_filename = json.load(f)['audio_filename']
+    scheduler.enqueue(meeting_id, os.path.join(get_meeting_path(meeting_id), audio_filename))
+
 @app.route('/api/transcripts', methods=['GET'])
 def list_transcripts():
-    """Returns a list of all meetings with their metadata."""
+    """Returns meetings with their metadata, newest first.
+
+    Pass ?limit=N to page through the list; the cursor for the next page is returned
+    in the X-Next-Cursor header and passed back as ?cursor=.
+    """
     try:
-        meetings = []
-        for meeting_id in os.listdir(TRANSCRIPTS_DIR):
-            meeting_path = get_meeting_path(meeting_id)
-            if os.path.isdir(meeting_path):
-                metadata_path = os.path.join(meeting_path, 'metadata.json')
-                if os.path.exists(metadata_path):
-                    with open(metadata_path, 'r') as f:
-                        metadata = json.load(f)
-                        metadata['id'] = meeting_id
-                        # Check for PDF existence
-                        pdf_filename = f"{metadata.get('audio_basename', 'transcript')}.pdf"
-                        metadata['pdf_exists'] = os.path.exists(os.path.join(meeting_path, pdf_filename))
-                        meetings.append(metadata)
-        
-        # Sort by date, descending
-        meetings.sort(key=lambda m: m.get('date', '1970-01-01'), reverse=True)
-        return jsonify(meetings)
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        meetings, next_cursor = meeting_index.list_meetings(limit, cursor)
+        response = jsonify(meetings)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+    except meeting_index.InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/search', methods=['GET'])
+def search_transcripts():
+    """Full-text search over transcripts. Returns ranked meetings with snippets and time offsets."""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Query parameter 'q' is required."}), 400
+    try:
+        return jsonify(search_index.search(query, request.args.get('limit', 20, type=int)))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/events', methods=['GET'])
+def job_events():
+    """Server-sent event stream of job status changes.
+
+    Starts with a snapshot of all unfinished jobs, then sends every change. Each
+    event carries the changed jobs and the ordered list of queued job ids. A
+    reconnecting client resumes from its Last-Event-ID.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+
+    def format_event(jobs, queue, seq):
+        return f"id: {seq}\ndata: {json.dumps({'jobs': jobs, 'queue': queue})}\n\n"
+
+    def stream():
+        if last_event_id is None:
+            jobs, queue, seq = job_status.active_jobs()
+            yield format_event(jobs, queue, seq)
+        else:
+            seq = last_event_id
+        idle_since = time.monotonic()
+        while True:
+            time.sleep(EVENTS_POLL_INTERVAL)
+            jobs, queue, seq = job_status.changes_since(seq)
+            if jobs:
+                yield format_event(jobs, queue, seq)
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= EVENTS_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                idle_since = time.monotonic()
+
+    # X-Accel-Buffering stops nginx from holding events back in its proxy buffer
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/transcripts/<meeting_id>', methods=['PUT'])
 def update_transcript_metadata(meeting_id):
     """Updates the metadata for a specific meeting."""
@@ -62,34 +145,82 @@ def update_transcript_metadata(meeting_id):
         return jsonify({"error": "Meeting not found."}), 404
 
     try:
-        with open(metadata_path, 'r+') as f:
-            metadata = json.load(f)
-            metadata['name'] = data.get('name', metadata['name'])
-            metadata['date'] = data.get('date', metadata['date'])
-            f.seek(0)
-            json.dump(metadata, f, indent=2)
-            f.truncate()
+        changes = {key: data[key] for key in ('name', 'date') if key in data}
+        meeting_index.update_metadata(meeting_id, meeting_path, changes)
         return jsonify({"success": "Metadata updated."})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/transcripts/<meeting_id>/<filename>', methods=['GET'])
 def download_transcript(meeting_id, filename):
-    """Serves a specific transcript file for download."""
-    try:
-        meeting_path = get_meeting_path(meeting_id)
-        return send_from_directory(meeting_path, filename, as_attachment=True)
-    except FileNotFoundError:
+    """Serves a specific transcript file for download.
+
+    With ?inline=1 the file is served for playback in the browser instead of as
+    an attachment. Range requests are supported either way, so audio can be seeked.
+    Archived audio can be requested with ?format=wav to have it decoded on the fly.
+    Reports (<audio name>.pdf/.txt/.srt/.vtt) are rendered on first request and
+    re-rendered once the transcript, analysis or metadata change.
+    """
+    meeting_path = safe_join(TRANSCRIPTS_DIR, meeting_id)
+    filepath = safe_join(meeting_path, filename) if meeting_path else None
+    if not filepath or not os.path.isdir(meeting_path):
         abort(404)
+    metadata_path = os.path.join(meeting_path, 'metadata.json')
+    if os.path.exists(metadata_path):
+        metadata = reports.load_metadata(meeting_path)
+        report_format = reports.report_format_for(metadata, filename)
+        if report_format:
+            reports.ensure_report(meeting_path, report_format, metadata)
+    if not os.path.isfile(filepath):
+        abort(404)
+    inline = request.args.get('inline') == '1'
+
+    if request.args.get('format') == 'wav' and archive.is_archived(filename):
+        wav_filename = os.path.splitext(filename)[0] + ".wav"
+        response = Response(archive.iter_decoded_wav(filepath), mimetype='audio/wav')
+        response.headers['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(wav_filename)}"
+        return response
+
+    # Only requests that came through nginx can be handed back to it
+    if X_ACCEL_REDIRECT and 'X-Real-IP' in request.headers:
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = X_ACCEL_PREFIX + quote(f"{meeting_id}/{filename}")
+        disposition = 'inline' if inline else 'attachment'
+        response.headers['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(filename)}"
+        return response
+    return send_from_directory(meeting_path, filename, as_attachment=not inline, conditional=True)
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Exposes the metrics of the worker, recorder and web server in Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/storage', methods=['GET'])
+def storage_report():
+    """Reports the bytes saved by archiving meeting audio and the free space left."""
+    return jsonify(archive.storage_report())
+
+@app.route('/api/transcripts/<meeting_id>/cancel', methods=['POST'])
+def cancel_job(meeting_id):
+    """Cancels a meeting's queued or running job, stopping the worker if it is already processing it."""
+    meeting_id = secure_filename(meeting_id)
+    if not os.path.isdir(get_meeting_path(meeting_id)):
+        return jsonify({"error": "File not found."}), 404
+    if not scheduler.cancel(meeting_id):
+        return jsonify({"error": "The meeting has no job waiting or running."}), 409
+    return jsonify({"success": f"Job for meeting '{meeting_id}' cancelled."}), 200
 
 @app.route('/api/transcripts/<meeting_id>', methods=['DELETE'])
 def delete_transcript(meeting_id):
-    """Deletes an entire meeting directory."""
+    """Deletes an entire meeting directory, first stopping its job if it is queued or running."""
     try:
         meeting_path = get_meeting_path(meeting_id)
         if os.path.isdir(meeting_path):
             import shutil
+            scheduler.cancel(meeting_id, job_status.DELETED)
             shutil.rmtree(meeting_path)
+            meeting_index.delete_meeting(meeting_id)
+            search_index.remove_transcript(meeting_id)
             return jsonify({"success": f"Meeting '{meeting_id}' deleted."}), 200
         else:
             return jsonify({"error": "File not found."}), 404
@@ -119,36 +250,199 @@ def upload_file():
         audio_basename = secure_filename(file.filename)
         audio_path = os.path.join(meeting_path, audio_basename)
         file.save(audio_path)
+        metrics.inc("transcriber_uploaded_bytes_total", os.path.getsize(audio_path))
 
         # 3. Create metadata.json
-        metadata = {
+        save_metadata(meeting_id, {
             "name": meeting_name,
             "date": meeting_date,
             "audio_filename": audio_basename
-        }
-        with open(os.path.join(meeting_path, 'metadata.json'), 'w') as f:
-            json.dump(metadata, f, indent=2)
+        })
 
         # 4. Create a job file in the queue
-        with open(os.path.join(JOB_QUEUE_DIR, f"{meeting_id}.job"), 'w') as f:
-            f.write(meeting_id)
+        queue_job(meeting_id)
 
         return jsonify({"success": f"Meeting '{meeting_name}' created and queued for processing."}), 201
 
     return jsonify({"error": f"File type not allowed. Allowed types are: {', '.join(ALLOWED_EXTENSIONS)}"}), 400
 
+# --- Resumable Upload API ---
+# POST /api/uploads starts an upload, PUT /api/uploads/<id>?offset=N appends a raw
+# chunk (checked against its X-Chunk-SHA256 header, if sent), GET /api/uploads/<id>
+# returns the offset to resume from, and POST /api/uploads/<id>/finalize verifies
+# the checksum and queues the meeting.
+
+def upload_error(e):
+    body = {"error": str(e)}
+    if e.offset is not None:
+        body["offset"] = e.offset
+    return jsonify(body), e.status
+
+@app.route('/api/uploads', methods=['POST'])
+def init_upload():
+    """Starts a resumable upload. Expects JSON with filename, size and optionally sha256, name and date."""
+    data = request.get_json() or {}
+    audio_basename = secure_filename(data.get('filename', ''))
+    size = data.get('size')
+    if not audio_basename or not allowed_file(audio_basename):
+        return jsonify({"error": f"File type not allowed. Allowed types are: {', '.join(ALLOWED_EXTENSIONS)}"}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({"error": "A positive file size is required."}), 400
+
+    meeting_id = f"{uuid.uuid4().hex}"
+    meeting_path = get_meeting_path(meeting_id)
+    os.makedirs(os.path.join(meeting_path, 'attachments'), exist_ok=True)
+    state = uploads.create_upload(meeting_path, audio_basename, size, data.get('sha256'),
+                                  data.get('name') or 'Untitled Meeting', data.get('date') or '1970-01-01')
+
+    if EARLY_DECODE_UPLOADS and uploads.can_decode_early(audio_basename):
+        save_metadata(meeting_id, {
+            "name": state["name"],
+            "date": state["date"],
+            "audio_filename": audio_basename
+        })
+        queue_job(meeting_id)
+
+    return jsonify({"upload_id": meeting_id, "offset": 0, "chunk_size": uploads.WRITE_BUFFER_SIZE * 8}), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Returns how many bytes of an upload have been received."""
+    meeting_path = get_meeting_path(secure_filename(upload_id))
+    state = uploads.load_state(meeting_path)
+    if state is None:
+        return jsonify({"error": "Upload not found."}), 404
+    return jsonify({"offset": uploads.current_offset(meeting_path, state), "size": state["size"]})
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Appends the raw request body at ?offset=N, streaming it straight to disk."""
+    meeting_path = get_meeting_path(secure_filename(upload_id))
+    state = uploads.load_state(meeting_path)
+    if state is None:
+        return jsonify({"error": "Upload not found."}), 404
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({"error": "Query parameter 'offset' is required."}), 400
+    try:
+        new_offset = uploads.append_chunk(meeting_path, state, offset, request.stream,
+                                          request.headers.get('X-Chunk-SHA256'))
+    except uploads.UploadError as e:
+        return upload_error(e)
+    metrics.inc("transcriber_uploaded_bytes_total", new_offset - offset)
+    return jsonify({"offset": new_offset})
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Verifies a completed upload and queues the meeting for processing."""
+    meeting_id = secure_filename(upload_id)
+    meeting_path = get_meeting_path(meeting_id)
+    state = uploads.load_state(meeting_path)
+    if state is None:
+        return jsonify({"error": "Upload not found."}), 404
+    try:
+        uploads.finalize(meeting_path, state)
+    except uploads.UploadError as e:
+        return upload_error(e)
+
+    if os.path.exists(os.path.join(meeting_path, 'metadata.json')):
+        # Queued early; queue it again only if decoding failed (e.g. after a checksum reset)
+        if job_status.get_state(meeting_id) == job_status.FAILED:
+            queue_job(meeting_id)
+    else:
+        save_metadata(meeting_id, {
+            "name": state["name"],
+            "date": state["date"],
+            "audio_filename": state["audio_filename"]
+        })
+        queue_job(meeting_id)
+    return jsonify({"success": f"Meeting '{state['name']}' created and queued for processing."}), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    """Abandons an unfinished upload and removes its meeting."""
+    meeting_id = secure_filename(upload_id)
+    if uploads.load_state(get_meeting_path(meeting_id)) is None:
+        return jsonify({"error": "Upload not found."}), 404
+    return delete_transcript(meeting_id)
+
 # --- Wi-Fi Management API ---
 
+# The Wi-Fi commands take seconds, so they run on a small pool of their own and
+# their results are cached. Concurrent requests share one in-flight command
+# instead of each starting a scan.
+wifi_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="wifi")
+
+class CachedCall:
+    """Runs func on the Wi-Fi executor and caches its result for ttl seconds.
+
+    Callers arriving while a run is in flight wait for that run. Exceptions are
+    passed to every waiting caller but are not cached.
+    """
+
+    def __init__(self, func, ttl):
+        self.func = func
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.value = None
+        self.expires = 0
+        self.future = None
+
+    def _store(self, future):
+        with self.lock:
+            if future.exception() is None:
+                self.value = future.result()
+                self.expires = time.monotonic() + self.ttl
+            self.future = None
+
+    def get(self):
+        with self.lock:
+            if time.monotonic() < self.expires:
+                return self.value
+            if self.future is None:
+                self.future = wifi_executor.submit(self.func)
+                self.future.add_done_callback(self._store)
+            future = self.future
+        return future.result(timeout=WIFI_COMMAND_TIMEOUT)
+
+    def invalidate(self):
+        with self.lock:
+            self.expires = 0
+
+def scan_networks():
+    """Scans for Wi-Fi networks on wlan0 and returns the sorted SSIDs."""
+    # Use iwlist to scan for networks. Requires sudo permissions.
+    scan_output = subprocess.check_output(['sudo', 'iwlist', 'wlan0', 'scan'], text=True,
+                                          stderr=subprocess.PIPE, timeout=WIFI_COMMAND_TIMEOUT)
+    ssids = re.findall(r'ESSID:"([^"]+)"', scan_output)
+    # Remove duplicates and empty strings
+    return sorted(list(set(filter(None, ssids))))
+
+def read_wifi_status():
+    """Returns the SSID and IP address of wlan0."""
+    try:
+        status_output = subprocess.check_output(['sudo', 'wpa_cli', '-i', 'wlan0', 'status'], text=True,
+                                                timeout=WIFI_COMMAND_TIMEOUT)
+        ip_output = subprocess.check_output(['sudo', 'ip', 'addr', 'show', 'wlan0'], text=True,
+                                            timeout=WIFI_COMMAND_TIMEOUT)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
+        return {"ssid": "Not connected", "ip_address": "N/A"}
+
+    ssid_match = re.search(r'^ssid=(.*)$', status_output, re.MULTILINE)
+    ip_match = re.search(r'inet (\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})', ip_output)
+
+    ssid = ssid_match.group(1) if ssid_match else "Not connected"
+    ip_address = ip_match.group(1) if ip_match else "N/A"
+    return {"ssid": ssid, "ip_address": ip_address}
+
+wifi_scan_cache = CachedCall(scan_networks, WIFI_SCAN_TTL)
+wifi_status_cache = CachedCall(read_wifi_status, WIFI_STATUS_TTL)
+
 @app.route('/api/wifi/scan', methods=['GET'])
 def wifi_scan():
     """Scans for Wi-Fi networks on wlan0."""
     try:
-        # Use iwlist to scan for networks. Requires sudo permissions.
-        scan_output = subprocess.check_output(['sudo', 'iwlist', 'wlan0', 'scan'], text=-True)
-        ssids = re.findall(r'ESSID:"([^"]+)"', scan_output)
-        # Remove duplicates and empty strings
-        unique_ssids = sorted(list(set(filter(None, ssids))))
-        return jsonify(unique_ssids)
+        return jsonify(wifi_scan_cache.get())
     except subprocess.CalledProcessError as e:
         if "No such device" in e.stderr:
             return jsonify({"error": "Wi-Fi adapter (wlan0) not found."}), 500
@@ -157,22 +451,15 @@ def wifi_scan():
         return jsonify({"error": f"Failed to scan for networks: {e.stderr}"}), 500
     except FileNotFoundError:
         return jsonify({"error": "iwlist command not found. Is wireless-tools installed?"}), 500
+    except (subprocess.TimeoutExpired, FutureTimeoutError):
+        return jsonify({"error": "Wi-Fi scan timed out."}), 504
 
 @app.route('/api/wifi/status', methods=['GET'])
 def wifi_status():
     """Gets the current status of the wlan0 interface."""
     try:
-        status_output = subprocess.check_output(['sudo', 'wpa_cli', '-i', 'wlan0', 'status'], text=True)
-        ip_output = subprocess.check_output(['sudo', 'ip', 'addr', 'show', 'wlan0'], text=True)
-
-        ssid_match = re.search(r'^ssid=(.*)$', status_output, re.MULTILINE)
-        ip_match = re.search(r'inet (\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})', ip_output)
-        
-        ssid = ssid_match.group(1) if ssid_match else "Not connected"
-        ip_address = ip_match.group(1) if ip_match else "N/A"
-
-        return jsonify({"ssid": ssid, "ip_address": ip_address})
-    except (subprocess.CalledProcessError, FileNotFoundError):
+        return jsonify(wifi_status_cache.get())
+    except FutureTimeoutError:
         return jsonify({"ssid": "Not connected", "ip_address": "N/A"})
 
 @app.route('/api/wifi/connect', methods=['POST'])
@@ -203,6 +490,7 @@ def wifi_connect():
 
         # Tell wpa_supplicant to re-read the configuration
         subprocess.check_call(['sudo', 'wpa_cli', '-i', 'wlan0', 'reconfigure'])
+        wifi_status_cache.invalidate()
 
         return jsonify({"success": f"Attempting to connect to '{ssid}'. Check status in a few moments."})
 
@@ -249,4 +537,5 @@ def delete_attachment(meeting_id, filename):
     return jsonify({"error": "Attachment not found."}), 404
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    # Development server only; the appliance serves the app with gunicorn (see gunicorn.conf.py)
+    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
\ No newline at end of file
@@ -1,97 +1,160 @@
 import os
 import time
 import json
-from vosk import Model, KaldiRecognizer
-from ctransformers import AutoModelForCausalLM
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+import multiprocessing
+from collections import deque
 from pydub import AudioSegment
-from reportlab.lib.styles import getSampleStyleSheet
-import wave
+from job_watcher import JobQueueWatcher
+import speech
+import summarizer
+import meeting_index
+import search_index
+import job_status
+import uploads
+import archive
+import metrics
+import reports
+import scheduler
+import model_server
+from pipeline import Pipeline, run_supervised
 
 # --- Configuration ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(BASE_DIR)
 
 JOB_QUEUE_DIR = os.path.join(PROJECT_ROOT, "job_queue")
+IN_PROGRESS_DIR = os.path.join(JOB_QUEUE_DIR, "in_progress")  # Jobs claimed by a worker process
 TRANSCRIPTS_DIR = os.path.join(PROJECT_ROOT, "transcripts")
 
-# Model paths - update if you placed them elsewhere
-VOSK_MODEL_PATH = "/opt/models/vosk-model"
-LLAMA_MODEL_PATH = "/opt/models/tinyllama-1.1b-chat-v1.0.Q4_K_M.gguf"
+# Where the models come from (model paths and LLM settings are in model_server.py):
+#   "server" - the model server (model_server.py) holds them; workers start instantly and share one copy
+#   "local"  - each worker loads its own copy at startup
+#   "fake"   - deterministic stand-ins (fake_models.py), for testing without the models
+MODEL_BACKEND = os.environ.get("TRANSCRIBER_MODEL_BACKEND", "server")
 
-POLL_INTERVAL = 5  # Seconds to wait before checking for new jobs
+# Audio is normally decoded by ffmpeg straight into the recognizer. Set this to
+# also keep a converted 16 kHz WAV of compressed uploads in the meeting folder.
+KEEP_CONVERTED_WAV = False
+# Once a job is done, replace its WAV with a compressed copy (see archive.ARCHIVE_FORMAT)
+ARCHIVE_AUDIO = True
+
+POLL_INTERVAL = 5  # Seconds between queue scans when inotify is unavailable
+# Pipeline mode runs decoding, transcription, analysis and rendering as concurrent
+# stages, so the LLM step of one job overlaps the transcription of the next.
+# Otherwise NUM_WORKERS processes each run whole jobs.
+PIPELINE_MODE = True
+STAGE_CONCURRENCY = {"decode": 1, "transcribe": 1, "analyze": 1, "render": 1, "archive": 1}
+NUM_WORKERS = os.cpu_count() or 1  # Worker processes processing jobs in parallel
+# Split long audio at pauses and transcribe the pieces on a process pool
+SEGMENTED_TRANSCRIPTION = True
+TRANSCRIBE_PROCESSES = os.cpu_count() or 1
+# Processes summarizing transcript windows in parallel; each runs its own LLM context
+LLM_PROCESSES = 1
+# With the "local" backend, split the cores between the processes running the LLM so
+# they don't oversubscribe the CPU
+LLM_THREADS = max(1, (os.cpu_count() or 1) // (STAGE_CONCURRENCY["analyze"] if PIPELINE_MODE else NUM_WORKERS))
 
 # --- Model Initialization ---
-print("Loading models...")
-if not os.path.exists(VOSK_MODEL_PATH):
-    raise FileNotFoundError(f"Vosk model not found at {VOSK_MODEL_PATH}")
-vosk_model = Model(VOSK_MODEL_PATH)
-
-if not os.path.exists(LLAMA_MODEL_PATH):
-    raise FileNotFoundError(f"Llama model not found at {LLAMA_MODEL_PATH}")
-llm = AutoModelForCausalLM.from_pretrained(
-    LLAMA_MODEL_PATH,
-    model_type="llama",
-    gpu_layers=0  # Force CPU-only inference, crucial for RPi
-)
-print("Models loaded successfully.")
-
-def transcribe_audio(filepath):
-    """Transcribes a WAV file using the Vosk model."""
-    wf = wave.open(filepath, "rb")
-    if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-        raise TypeError("Audio file must be WAV format mono 16-bit.")
-
-    rec = KaldiRecognizer(vosk_model, wf.getframerate())
+if MODEL_BACKEND == "server":
+    # Connects lazily, on the first request
+    from model_client import Model, KaldiRecognizer, LLM
+    vosk_model = Model()
+    llm = LLM()
+elif MODEL_BACKEND == "fake":
+    from fake_models import Model, KaldiRecognizer, LLM
+    vosk_model = Model()
+    llm = LLM()
+else:
+    from vosk import Model, KaldiRecognizer
+
+    print("Loading models...")
+    if not os.path.exists(model_server.VOSK_MODEL_PATH):
+        raise FileNotFoundError(f"Vosk model not found at {model_server.VOSK_MODEL_PATH}")
+    vosk_model = Model(model_server.VOSK_MODEL_PATH)
+    llm = model_server.load_llm(threads=LLM_THREADS)
+    print("Models loaded successfully.")
+
+def transcribe_segment(segment):
+    """Transcribes one (start_sample, pcm_bytes, rate) piece of a recording.
+
+    Returns the transcript segments with timestamps relative to the full recording.
+    """
+    start_sample, pcm, rate = segment
+    rec = KaldiRecognizer(vosk_model, rate)
     rec.SetWords(True)
 
-    full_transcript = ""
-    while True:
-        data = wf.readframes(4000)
-        if len(data) == 0:
-            break
-        if rec.AcceptWaveform(data):
-            result = json.loads(rec.Result())
-            full_transcript += result.get("text", "") + " "
-
-    result = json.loads(rec.FinalResult())
-    full_transcript += result.get("text", "")
-    return full_transcript.strip()
-
-def analyze_text(text):
-    """Generates a summary and key points from text using the Llama model."""
-    prompt = f"""
-    Analyze the following transcript. Provide a concise one-paragraph summary and then list the top 3-5 key points as a bulleted list.
-
-    Transcript:
-    "{text}"
-
-    Analysis:
+    builder = speech.TranscriptBuilder(offset=start_sample / rate)
+    for offset in range(0, len(pcm), 8000):
+        builder.feed(rec, pcm[offset:offset + 8000])
+    builder.finish(rec)
+    return builder.segments
+
+def imap_bounded(pool, func, items, max_pending):
+    """Like Pool.imap, but only keeps max_pending items in flight so input is read lazily."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def transcribe_segments(segments, rate, processes):
+    """Transcribes (start_sample, pcm_bytes) segments in parallel and stitches them in order."""
+    tasks = ((start_sample, pcm, rate) for start_sample, pcm in segments)
+    builder = speech.TranscriptBuilder()
+    if processes <= 1:
+        for task in tasks:
+            builder.segments.extend(transcribe_segment(task))
+        return builder.transcript()
+
+    # Forked pool processes share vosk_model with this process through copy-on-write,
+    # or open their own connection to the model server
+    with multiprocessing.get_context("fork").Pool(processes) as pool:
+        for segment_results in imap_bounded(pool, transcribe_segment, tasks, processes * 2):
+            builder.segments.extend(segment_results)
+    return builder.transcript()
+
+def transcribe_audio(filepath, on_progress=None, source=None):
+    """Transcribes an audio file using the Vosk model.
+
+    Compressed formats are decoded by ffmpeg while they are being recognized.
+    on_progress(fraction, seconds), if given, is called as the audio is consumed.
+    source optionally supplies the file's bytes while it is still being uploaded.
+    Returns a transcript dict with the full text and timestamped segments.
     """
-    print("Generating analysis with LLM...")
-    analysis = llm(prompt, max_new_tokens=256, temperature=0.7)
-    print("Analysis complete.")
-    return analysis
+    rate, chunks = speech.open_pcm_stream(filepath, source)
+    if on_progress:
+        duration = speech.get_duration(filepath) if source is None else None
+        chunks = speech.track_progress(chunks, rate, duration, on_progress)
 
-def create_pdf(transcript, analysis, output_path):
-    """Creates a PDF document from the transcript and analysis."""
-    doc = SimpleDocTemplate(output_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
+    if SEGMENTED_TRANSCRIPTION:
+        segments = speech.iter_pcm_segments(chunks, rate)
+        return transcribe_segments(segments, rate, TRANSCRIBE_PROCESSES)
 
-    story.append(Paragraph("Audio Transcription and Analysis", styles['h1']))
-    story.append(Spacer(1, 12))
+    rec = KaldiRecognizer(vosk_model, rate)
+    rec.SetWords(True)
+
+    builder = speech.TranscriptBuilder()
+    for data in chunks:
+        builder.feed(rec, data)
 
-    story.append(Paragraph("Full Transcript", styles['h2']))
-    story.append(Paragraph(transcript.replace("\n", "<br/>"), styles['BodyText']))
-    story.append(Spacer(1, 24))
+    return builder.finish(rec)
 
-    story.append(Paragraph("AI-Generated Analysis", styles['h2']))
-    story.append(Paragraph(analysis.replace("\n", "<br/>"), styles['BodyText']))
+def llm_model_name():
+    """The LLM's name, as used in cache keys and recorded with each analysis."""
+    return getattr(llm, "model_name", os.path.basename(model_server.LLAMA_MODEL_PATH))
 
-    doc.build(story)
-    print(f"PDF generated at {output_path}")
+def analyze_text(text, on_progress=None):
+    """Generates a summary and key points from text using the Llama model.
+
+    Long transcripts are summarized in windows that fit the model's context.
+    on_progress(fraction, tokens_generated), if given, is called as the analysis advances.
+    """
+    print("Generating analysis with LLM...")
+    analysis = summarizer.analyze(llm, text, llm_model_name(), LLM_PROCESSES, on_progress)
+    print("Analysis complete.")
+    return analysis
 
 def handle_audio_conversion(filepath):
     """Converts non-WAV files to the required WAV format."""
@@ -99,7 +162,7 @@ def handle_audio_conversion(filepath):
     if extension.lower() == ".wav":
         return filepath # No conversion needed
 
-    if extension.lower() in [".m4a", ".mp3", ".ogg"]:
+    if extension.lower() in [".m4a", ".mp3", ".ogg", ".opus", ".flac"]:
         print(f"Converting {os.path.basename(filepath)} to WAV...")
         sound = AudioSegment.from_file(filepath)
         wav_path = filename + ".wav"
@@ -110,68 +173,281 @@ def handle_audio_conversion(filepath):
 
     raise TypeError(f"Unsupported audio format: {extension}")
 
-def process_job(meeting_id):
-    """The main processing pipeline for a single meeting."""
+def reject_job(meeting_id, reason):
+    """Marks a job that can't be processed as failed, so it doesn't show as queued forever."""
+    print(f"Error: {reason} for job {meeting_id}. Skipping.")
+    job_status.set_state(meeting_id, job_status.FAILED, detail=reason)
+
+def load_job(meeting_id):
+    """Reads and validates a meeting's metadata. Returns the job dict, or None if it can't be processed."""
     meeting_path = os.path.join(TRANSCRIPTS_DIR, meeting_id)
     metadata_path = os.path.join(meeting_path, 'metadata.json')
 
     if not os.path.exists(metadata_path):
-        print(f"Error: metadata.json not found for job {meeting_id}. Skipping.")
-        return
+        reject_job(meeting_id, "metadata.json not found")
+        return None
 
     with open(metadata_path, 'r') as f:
         metadata = json.load(f)
 
     audio_filename = metadata.get('audio_filename')
     if not audio_filename:
-        print(f"Error: audio_filename not in metadata for job {meeting_id}. Skipping.")
-        return
+        reject_job(meeting_id, "audio_filename not in metadata")
+        return None
 
     audio_filepath = os.path.join(meeting_path, audio_filename)
-    if not os.path.exists(audio_filepath):
-        print(f"Error: Audio file {audio_filename} not found for job {meeting_id}. Skipping.")
+    # An upload queued for early decoding may still be arriving
+    uploading = not os.path.exists(audio_filepath) and os.path.exists(uploads.part_path(meeting_path, audio_filename))
+    if not os.path.exists(audio_filepath) and not uploading:
+        reject_job(meeting_id, f"Audio file {audio_filename} not found")
+        return None
+
+    return {
+        "meeting_id": meeting_id,
+        "meeting_path": meeting_path,
+        "metadata": metadata,
+        "audio_filepath": audio_filepath,
+        "uploading": uploading
+    }
+
+@scheduler.cancellable
+@metrics.timed_stage("decode")
+def decode_stage(job):
+    """Loads the live transcript from the recorder, if any.
+
+    Audio is decoded while it is transcribed, so this stage only converts the
+    file when KEEP_CONVERTED_WAV asks for a WAV copy.
+    """
+    print(f"Processing job for meeting: {job['metadata'].get('name', job['meeting_id'])}")
+    job_status.set_state(job["meeting_id"], job_status.DECODING)
+    job["transcript"] = speech.load_transcript(job["meeting_path"])
+    if job["transcript"] is not None:
+        print("Using transcript recorded live.")
+    elif KEEP_CONVERTED_WAV and not job["uploading"]:
+        wav_filepath = handle_audio_conversion(job["audio_filepath"])
+        if wav_filepath != job["audio_filepath"]:
+            job["audio_filepath"] = wav_filepath
+            job["metadata"] = meeting_index.update_metadata(job["meeting_id"], job["meeting_path"],
+                                                            {"audio_filename": os.path.basename(wav_filepath)})
+    return job
+
+@scheduler.cancellable
+@metrics.timed_stage("transcribe")
+def transcribe_stage(job):
+    """Transcribes the audio unless a transcript already exists."""
+    if job["transcript"] is None:
+        reporter = job_status.ProgressReporter(job["meeting_id"], job_status.TRANSCRIBING)
+        source = None
+        if job["uploading"]:
+            print("Decoding upload while it is still arriving.")
+            source = uploads.iter_growing_upload(job["meeting_path"], job["metadata"]["audio_filename"])
+        audio_seconds = [0]
+
+        def on_progress(fraction, seconds):
+            audio_seconds[0] = seconds
+            reporter.update(fraction, f"{seconds:.0f}s of audio transcribed")
+
+        start = time.monotonic()
+        job["transcript"] = transcribe_audio(job["audio_filepath"], on_progress, source)
+        if audio_seconds[0]:
+            metrics.inc("transcriber_audio_seconds_total", audio_seconds[0])
+            metrics.observe("transcriber_transcription_rtf", (time.monotonic() - start) / audio_seconds[0])
+        speech.save_transcript(job["meeting_path"], job["transcript"])
+
+    if not job["transcript"]["text"]:
+        print("Transcription returned no text. Aborting job.")
+        job_status.set_state(job["meeting_id"], job_status.FAILED, detail="No speech was recognized.")
+        return None
+
+    search_index.index_transcript(job["meeting_id"], job["transcript"])
+    return job
+
+@scheduler.cancellable
+@metrics.timed_stage("analyze")
+def analyze_stage(job):
+    reporter = job_status.ProgressReporter(job["meeting_id"], job_status.ANALYZING)
+    generated = [0]
+
+    def on_progress(fraction, tokens):
+        generated[0] = tokens
+        reporter.update(fraction, f"{tokens} tokens generated")
+
+    start = time.monotonic()
+    job["analysis"] = analyze_text(job["transcript"]["text"], on_progress)
+    reports.save_analysis(job["meeting_path"], job["analysis"], llm_model_name())
+    if generated[0]:
+        metrics.inc("transcriber_llm_tokens_total", generated[0])
+        metrics.observe("transcriber_llm_tokens_per_second", generated[0] / (time.monotonic() - start))
+    return job
+
+@scheduler.cancellable
+@metrics.timed_stage("render")
+def render_stage(job):
+    job_status.set_state(job["meeting_id"], job_status.RENDERING)
+    # The PDF is rendered now so it is ready for the UI's download link; other
+    # formats are rendered when first downloaded
+    reports.ensure_report(job["meeting_path"], "pdf", job["metadata"])
+    meeting_index.set_pdf_exists(job["meeting_id"])
+    enqueued_at = job_status.get_enqueued_at(job["meeting_id"])
+    job_status.set_state(job["meeting_id"], job_status.DONE, 1.0)
+    if enqueued_at:
+        metrics.observe("transcriber_job_latency_seconds", time.time() - enqueued_at)
+    return job
+
+@scheduler.cancellable
+@metrics.timed_stage("archive")
+def archive_stage(job):
+    """Compresses the audio of a finished job.
+
+    Only uncompressed WAVs are archived. The job is already done, so a failure
+    here is logged and the WAV is kept.
+    """
+    if not ARCHIVE_AUDIO or not os.path.exists(job["audio_filepath"]):
+        return job
+    try:
+        metadata = archive.archive_audio(job["meeting_id"], job["meeting_path"])
+        if metadata is not None:
+            job["metadata"] = metadata
+            info = metadata["archive"]
+            print(f"Archived audio as {metadata['audio_filename']} "
+                  f"({info['original_bytes']} -> {info['archived_bytes']} bytes).")
+            job["audio_filepath"] = os.path.join(job["meeting_path"], metadata["audio_filename"])
+    except Exception as e:
+        print(f"!!! Could not archive the audio of job {job['meeting_id']}: {e}")
+    return job
+
+STAGES = [
+    ("decode", decode_stage),
+    ("transcribe", transcribe_stage),
+    ("analyze", analyze_stage),
+    ("render", render_stage),
+    ("archive", archive_stage)
+]
+
+def process_job(entry):
+    """The main processing pipeline for a single meeting, running every stage in series.
+
+    entry is the job file's contents (see scheduler.read_job).
+    """
+    meeting_id = entry["meeting_id"]
+    job = load_job(meeting_id)
+    if job is None:
         return
 
-    print(f"Processing job for meeting: {metadata.get('name', meeting_id)}")
     try:
-        # 1. Convert audio if necessary and Transcribe
-        wav_filepath = handle_audio_conversion(audio_filepath)
-        transcript = transcribe_audio(wav_filepath)
-        
-        if not transcript:
-            print("Transcription returned no text. Aborting job.")
-            return
-
-        # 2. Analyze text
-        analysis = analyze_text(transcript)
-
-        # 3. Generate PDF
-        pdf_filename = os.path.splitext(audio_filename)[0] + ".pdf"
-        pdf_path = os.path.join(meeting_path, pdf_filename)
-        create_pdf(transcript, analysis, pdf_path)
+        for _, stage in STAGES:
+            job = stage(job)
+            if job is None:
+                return
+    except job_status.JobCancelled:
+        print(f"Job {meeting_id} was cancelled while running.")
     except Exception as e:
         print(f"!!! An error occurred while processing job {meeting_id}: {e}")
+        scheduler.retry_or_fail(entry, e)
+
+def recover_claimed_jobs():
+    """Moves jobs left in progress by a crashed or killed worker back into the queue."""
+    os.makedirs(IN_PROGRESS_DIR, exist_ok=True)
+    for job_filename in os.listdir(IN_PROGRESS_DIR):
+        print(f"Recovering interrupted job: {job_filename}")
+        claimed_path = os.path.join(IN_PROGRESS_DIR, job_filename)
+        entry = scheduler.read_job(claimed_path)
+        os.replace(claimed_path, os.path.join(JOB_QUEUE_DIR, job_filename))
+        # A cancelled job keeps its state and is dropped when claimed again
+        job_status.set_state(entry["meeting_id"], job_status.QUEUED,
+                             priority=entry["priority"], enqueued_at=entry["enqueued_at"])
+
+def claim_job(job_filename):
+    """Atomically claims a queued job by moving it to the in-progress directory.
+
+    Returns the path of the claimed job file, or None if another worker claimed it first.
+    """
+    claimed_path = os.path.join(IN_PROGRESS_DIR, job_filename)
+    try:
+        os.rename(os.path.join(JOB_QUEUE_DIR, job_filename), claimed_path)
+    except FileNotFoundError:
+        return None
+    return claimed_path
+
+def remove_invalid_queue_files(queue_files):
+    """Removes leftover non-job files (e.g. from the old transcriber.py) from the job queue."""
+    for invalid_file in queue_files:
+        invalid_path = os.path.join(JOB_QUEUE_DIR, invalid_file)
+        if invalid_file.endswith(".job") or os.path.isdir(invalid_path):
+            continue
+        print(f"Removing invalid file from job queue: {invalid_file}")
+        os.remove(invalid_path)
+
+def iter_claimed_jobs():
+    """Yields (job entry, claimed_path) for each job this process claims, waiting for new ones.
+
+    Jobs are claimed in the order set by scheduler.SCHEDULING_POLICY.
+    """
+    # Each process needs its own watcher; an inotify descriptor must not be shared across fork
+    watcher = JobQueueWatcher(JOB_QUEUE_DIR, POLL_INTERVAL, schedule=scheduler.schedule)
+    if not watcher.uses_inotify:
+        print(f"inotify unavailable, polling the job queue every {POLL_INTERVAL}s.")
+
+    while True:
+        job_filename = watcher.next_job()
+        claimed_path = claim_job(job_filename)
+        if claimed_path:
+            yield scheduler.read_job(claimed_path), claimed_path
+
+def worker_loop():
+    """Claims and processes whole jobs from the queue until the process is terminated."""
+    for entry, claimed_path in iter_claimed_jobs():
+        process_job(entry)
+        os.remove(claimed_path) # Remove job file after processing
+
+def finish_job(job):
+    """Removes the job file once a job has left the pipeline."""
+    os.remove(job["claimed_path"])
+
+def fail_job(job, error):
+    scheduler.retry_or_fail(job["entry"], error)
+
+def feed_pipeline(pipeline):
+    """Claims jobs from the queue and hands them to the pipeline's first stage.
+
+    A job is only claimed once the pipeline can start it, so it is chosen by
+    priority among everything queued by then rather than queued up behind others.
+    """
+    claimed_jobs = iter_claimed_jobs()
+    while True:
+        pipeline.wait_for_room()
+        entry, claimed_path = next(claimed_jobs)
+        job = load_job(entry["meeting_id"])
+        if job is None:
+            os.remove(claimed_path)
+            continue
+        job["entry"] = entry
+        job["claimed_path"] = claimed_path
+        pipeline.submit(job)
+
+def run_pipeline():
+    """Runs each stage in its own processes, with a feeder claiming jobs for the first stage."""
+    stages = [(name, stage, STAGE_CONCURRENCY[name]) for name, stage in STAGES]
+    # Decoding mostly passes jobs straight on, so a job is admitted only when transcription is free too
+    pipeline = Pipeline(stages, finish_job, fail_job, admit_stages=2)
+    run_supervised([("feeder", feed_pipeline, (pipeline,))] + pipeline.children())
+
+def run_pool(num_workers):
+    """Runs num_workers processes that each claim and process whole jobs."""
+    run_supervised([(f"worker-{index}", worker_loop, ()) for index in range(num_workers)])
 
 if __name__ == "__main__":
     os.makedirs(JOB_QUEUE_DIR, exist_ok=True)
     os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
-    
-    print("Worker started. Monitoring job queue...")
-    while True:
-        queue_files = os.listdir(JOB_QUEUE_DIR)
-        jobs = sorted([f for f in queue_files if f.endswith(".job")])
-        
-        if jobs:
-            job_filename = jobs[0]
-            job_path = os.path.join(JOB_QUEUE_DIR, job_filename)
-            meeting_id = job_filename.replace(".job", "")
-            process_job(meeting_id)
-            os.remove(job_path) # Remove job file after processing
-        else:
-            # Cleanup: If there are non-job files, they are from the old transcriber.py. Remove them.
-            for invalid_file in queue_files:
-                invalid_path = os.path.join(JOB_QUEUE_DIR, invalid_file)
-                print(f"Removing invalid file from job queue: {invalid_file}")
-                os.remove(invalid_path)
+    remove_invalid_queue_files(os.listdir(JOB_QUEUE_DIR))
+    recover_claimed_jobs()
 
-            time.sleep(POLL_INTERVAL)
\ No newline at end of file
+    if PIPELINE_MODE:
+        print(f"Worker started in pipeline mode with stages {STAGE_CONCURRENCY}. Monitoring job queue...")
+        run_pipeline()
+    else:
+        print(f"Worker started with {NUM_WORKERS} processes. Monitoring job queue...")
+        if NUM_WORKERS > 1:
+            run_pool(NUM_WORKERS)
+        else:
+            worker_loop()
@@ -0,0 +1,259 @@
+"""Benchmarks the worker's processing stages end to end on synthetic recordings.
+
+Generates fixtures of several lengths and formats, runs each through the
+worker's stages (decode, transcribe, analyze, render, archive) as process_job
+does, and reports per-stage wall time, CPU time, peak RSS and real-time factor
+as JSON. The database and LLM caches are redirected to a temporary directory,
+so runs start cold and leave the appliance's data alone.
+
+    python3 benchmarks/end_to_end.py run --models fake --output before.json
+    python3 benchmarks/end_to_end.py compare before.json after.json
+
+--models picks the worker's model backend (see MODEL_BACKEND in worker.py).
+"fake" runs anywhere, e.g. on x86 CI, and measures everything but the models.
+"local" loads the real models in this process. "server" measures the worker
+side only, since the model server's CPU time is spent in another process.
+Synthetic noise contains no speech, so with real models pass --speech-wav with
+a real recording to be looped or trimmed to each fixture length.
+"""
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+RATE = 16000
+DEFAULT_MINUTES = [1, 5, 15]
+DEFAULT_FORMATS = ["wav", "mp3", "m4a"]
+REGRESSION_THRESHOLD = 10  # Percent slower than the baseline that counts as a regression
+
+def loop_wav(source_path, path, minutes):
+    """Writes a 16 kHz mono WAV of the given length by repeating a real recording."""
+    with wave.open(source_path, "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != RATE:
+            raise ValueError("--speech-wav must be a 16 kHz mono 16-bit WAV")
+        pcm = wf.readframes(wf.getnframes())
+    total_bytes = int(minutes * 60 * RATE) * 2
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(RATE)
+        written = 0
+        while written < total_bytes:
+            data = pcm[:total_bytes - written]
+            out.writeframes(data)
+            written += len(data)
+    return total_bytes / 2 / RATE
+
+def make_fixture(directory, minutes, audio_format, speech_wav=None):
+    """Writes a recording of the given length and format. Returns (path, duration in seconds)."""
+    from segmented_transcription import write_synthetic_wav
+
+    wav_path = os.path.join(directory, f"fixture_{minutes}m.wav")
+    if not os.path.exists(wav_path):
+        if speech_wav:
+            loop_wav(speech_wav, wav_path, minutes)
+        else:
+            write_synthetic_wav(wav_path, minutes)
+    with wave.open(wav_path, "rb") as wf:
+        duration = wf.getnframes() / wf.getframerate()
+    if audio_format == "wav":
+        return wav_path, duration
+
+    path = os.path.join(directory, f"fixture_{minutes}m.{audio_format}")
+    if not os.path.exists(path):
+        subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", wav_path, path], check=True)
+    return path, duration
+
+def reset_peak_rss():
+    """Resets this process's peak RSS (VmHWM), where the kernel allows it."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # Peak since start; Linux reports KB
+
+def cpu_seconds():
+    """CPU time of this process plus its finished children (pool processes, ffmpeg)."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def measure(func, *args):
+    """Runs func, returning (result, {wall_s, cpu_s, peak_rss_kb, children_peak_rss_kb})."""
+    reset_peak_rss()
+    cpu_start = cpu_seconds()
+    start = time.perf_counter()
+    result = func(*args)
+    wall = time.perf_counter() - start
+    return result, {
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu_seconds() - cpu_start, 3),
+        "peak_rss_kb": peak_rss_kb(),
+        # The kernel only keeps the largest child ever, not a per-stage peak
+        "children_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    }
+
+def run_fixture(worker, transcripts_dir, fixture_path, duration, meeting_id):
+    """Runs one recording through every stage, returning the per-stage measurements."""
+    meeting_path = os.path.join(transcripts_dir, meeting_id)
+    os.makedirs(meeting_path)
+    audio_filename = os.path.basename(fixture_path)
+    shutil.copy(fixture_path, os.path.join(meeting_path, audio_filename))
+    with open(os.path.join(meeting_path, "metadata.json"), "w") as f:
+        json.dump({"name": meeting_id, "date": "2000-01-01", "audio_filename": audio_filename}, f)
+
+    job = worker.load_job(meeting_id)
+    stages = {}
+    for name, stage in worker.STAGES:
+        if job is None:
+            stages[name] = {"skipped": True} # e.g. no speech recognized in synthetic noise
+            continue
+        job, stats = measure(stage, job)
+        stats["rtf"] = round(stats["wall_s"] / duration, 4)
+        stages[name] = stats
+
+    measured = [stats for stats in stages.values() if "wall_s" in stats]
+    total_wall = sum(stats["wall_s"] for stats in measured)
+    total = {
+        "wall_s": round(total_wall, 3),
+        "cpu_s": round(sum(stats["cpu_s"] for stats in measured), 3),
+        "peak_rss_kb": max((stats["peak_rss_kb"] for stats in measured), default=0),
+        "rtf": round(total_wall / duration, 4)
+    }
+    return {"stages": stages, "total": total}
+
+def run_fixtures(args, tmp):
+    """Imports the worker with the chosen models and runs every fixture through it."""
+    # The worker picks its model backend when it is imported
+    os.environ["TRANSCRIBER_MODEL_BACKEND"] = args.models
+    import meeting_index
+    import summarizer
+    import worker
+
+    meeting_index.DB_PATH = os.path.join(tmp, "meetings.db")
+    summarizer.SUMMARY_CACHE_DIR = os.path.join(tmp, "cache", "summaries")
+    summarizer.ANALYSIS_CACHE_DIR = os.path.join(tmp, "cache", "analyses")
+    worker.TRANSCRIPTS_DIR = os.path.join(tmp, "transcripts")
+    worker.KEEP_CONVERTED_WAV = args.convert
+    fixtures_dir = os.path.join(tmp, "fixtures")
+    os.makedirs(fixtures_dir)
+
+    runs = []
+    for minutes in args.minutes:
+        for audio_format in args.formats:
+            fixture_path, duration = make_fixture(fixtures_dir, minutes, audio_format, args.speech_wav)
+            print(f"Running {minutes} min {audio_format} fixture...")
+            result = run_fixture(worker, worker.TRANSCRIPTS_DIR, fixture_path, duration, f"{minutes}m-{audio_format}")
+            result["fixture"] = {
+                "name": f"{minutes}m-{audio_format}",
+                "format": audio_format,
+                "duration_s": duration,
+                "bytes": os.path.getsize(fixture_path)
+            }
+            runs.append(result)
+    return runs
+
+def run(args):
+    tmp = tempfile.mkdtemp(prefix="transcriber-bench-")
+    try:
+        # The worker logs to stdout, which may be carrying the report
+        with contextlib.redirect_stdout(sys.stderr):
+            runs = run_fixtures(args, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {
+        "environment": {
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "models": args.models,
+            "keep_converted_wav": args.convert,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "runs": runs
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+def compare(args):
+    """Prints the change in wall time per fixture and stage. Returns 1 if anything regressed."""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline["environment"]["machine"] != current["environment"]["machine"]:
+        print("Warning: the runs are from different machines.")
+
+    baseline_runs = {run["fixture"]["name"]: run for run in baseline["runs"]}
+    regressions = 0
+    print(f"{'fixture':>12} {'stage':>12} {'before s':>9} {'after s':>9} {'change':>8}")
+    for run in current["runs"]:
+        name = run["fixture"]["name"]
+        if name not in baseline_runs:
+            continue
+        before_stages = dict(baseline_runs[name]["stages"], total=baseline_runs[name]["total"])
+        for stage, after in dict(run["stages"], total=run["total"]).items():
+            before = before_stages.get(stage, {})
+            if "wall_s" not in after or not before.get("wall_s"):
+                continue
+            change = (after["wall_s"] - before["wall_s"]) / before["wall_s"] * 100
+            flag = ""
+            if change > args.threshold:
+                flag = " REGRESSION"
+                regressions += 1
+            print(f"{name:>12} {stage:>12} {before['wall_s']:9.2f} {after['wall_s']:9.2f} {change:+7.1f}%{flag}")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="benchmark the stages and write a JSON report")
+    run_parser.add_argument("--models", choices=["fake", "local", "server"], default="fake")
+    run_parser.add_argument("--minutes", type=float, nargs="+", default=DEFAULT_MINUTES)
+    run_parser.add_argument("--formats", nargs="+", default=DEFAULT_FORMATS, help="wav, or any format ffmpeg writes")
+    run_parser.add_argument("--speech-wav", help="a 16 kHz mono WAV of real speech to build the fixtures from")
+    run_parser.add_argument("--convert", action="store_true", help="also keep a converted WAV (KEEP_CONVERTED_WAV)")
+    run_parser.add_argument("--output", help="write the report here instead of to stdout")
+
+    compare_parser = commands.add_parser("compare", help="diff two reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                                help="percent slowdown reported as a regression")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmarks LLM generation speed for combinations of threads, batch size and context length.
+
+Loads the model once per context length (the only setting fixed at load time)
+and runs the analysis prompt on a synthetic transcript with every thread count
+and batch size, streaming the output to time it. Reports the time to the first
+token (prompt evaluation, which batch size affects) and the generation speed in
+tokens/s. Needs the model file model_server.py loads, so run it on the appliance:
+
+    python3 benchmarks/llm_generation.py --threads 2 4 --batch-sizes 8 32
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import summarizer
+import model_server
+import fake_models
+
+def synthetic_transcript(words, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ["the", "budget", "we", "should", "review", "next", "quarter", "team", "agreed", "deadline",
+                  "launch", "customer", "feedback", "plan", "meeting", "action", "item", "follow", "up", "on"]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+def run(llm, prompt, threads, batch_size, max_new_tokens):
+    """Generates once, returning (seconds to first token, tokens generated, tokens/s after the first)."""
+    times = []
+    start = time.perf_counter()
+    summarizer.generate(llm, prompt, lambda token: times.append(time.perf_counter()),
+                        {"threads": threads, "batch_size": batch_size, "max_new_tokens": max_new_tokens})
+    if not times:
+        return time.perf_counter() - start, 0, 0.0
+    first_token = times[0] - start
+    rate = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+    return first_token, len(times), rate
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, max(1, cpus // 2), cpus}))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--context-lengths", type=int, nargs="+", default=[model_server.LLM_CONTEXT_LENGTH])
+    parser.add_argument("--words", type=int, default=600, help="length of the synthetic transcript")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--fake", action="store_true", help="use the fake model (checks the harness only)")
+    args = parser.parse_args()
+
+    prompt = summarizer.ANALYSIS_PROMPT.format(text=synthetic_transcript(args.words))
+    print(f"{'context':>8} {'threads':>8} {'batch':>6} {'first tok s':>12} {'tokens':>7} {'tok/s':>7}")
+    for context_length in args.context_lengths:
+        llm = fake_models.LLM() if args.fake else model_server.load_llm(context_length=context_length)
+        for threads in args.threads:
+            for batch_size in args.batch_sizes:
+                first_token, tokens, rate = run(llm, prompt, threads, batch_size, args.max_new_tokens)
+                print(f"{context_length:>8} {threads:>8} {batch_size:>6} {first_token:12.2f} {tokens:>7} {rate:7.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmarks segmented Vosk transcription against the number of worker processes.
+
+Generates a synthetic multi-minute WAV of noise bursts separated by pauses and
+times worker.transcribe_audio on it with 1..N processes. Needs the models that
+worker.py loads, so run it on the appliance:
+
+    python3 benchmarks/segmented_transcription.py --minutes 5
+"""
+import os
+import sys
+import time
+import wave
+import array
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import worker
+
+RATE = 16000
+
+def write_synthetic_wav(path, minutes, seed=0):
+    """Writes noise bursts of 2-8 s separated by 0.3-1.5 s pauses, like speech with breaks."""
+    rng = random.Random(seed)
+    total_samples = int(minutes * 60 * RATE)
+    written = 0
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        while written < total_samples:
+            burst = min(int(rng.uniform(2, 8) * RATE), total_samples - written)
+            samples = array.array("h", rng.randbytes(burst * 2))
+            wf.writeframes(array.array("h", (sample // 8 for sample in samples)).tobytes())
+            written += burst
+            pause = min(int(rng.uniform(0.3, 1.5) * RATE), total_samples - written)
+            wf.writeframes(bytes(pause * 2))
+            written += pause
+    return total_samples / RATE
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=5, help="length of the synthetic recording")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = os.path.join(tmp, "synthetic.wav")
+        duration = write_synthetic_wav(wav_path, args.minutes)
+        print(f"Synthetic recording: {duration:.0f}s")
+
+        worker.SEGMENTED_TRANSCRIPTION = False
+        start = time.perf_counter()
+        worker.transcribe_audio(wav_path)
+        baseline = time.perf_counter() - start
+        print(f"{'mode':>12} {'seconds':>9} {'RTF':>6} {'speedup':>8}")
+        print(f"{'sequential':>12} {baseline:9.1f} {baseline / duration:6.2f} {1.0:8.2f}")
+
+        worker.SEGMENTED_TRANSCRIPTION = True
+        for processes in range(1, args.max_processes + 1):
+            worker.TRANSCRIBE_PROCESSES = processes
+            start = time.perf_counter()
+            worker.transcribe_audio(wav_path)
+            elapsed = time.perf_counter() - start
+            print(f"{f'{processes} proc':>12} {elapsed:9.1f} {elapsed / duration:6.2f} {baseline / elapsed:8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -200,12 +200,18 @@ create_service_file() {
     if [ ! -z "$5" ]; then
         WORKING_DIR_LINE="WorkingDirectory=$5"
     fi
+    # Optional: a unit this service can't run without; it is started along with it
+    REQUIRES_LINE=""
+    if [ ! -z "$6" ]; then
+        REQUIRES_LINE="Requires=$6"
+    fi
 
     echo "Creating ${SERVICE_FILE_PATH}..."
     sudo bash -c "cat > ${SERVICE_FILE_PATH}" <<EOF
 [Unit]
 Description=${DESCRIPTION}
 After=${AFTER}
+${REQUIRES_LINE}
 
 [Service]
 Type=simple
@@ -220,12 +226,13 @@ EOF
 }
 
 create_service_file "/etc/systemd/system/transcriber-hw.service" "Transcriber Hardware Service" "/usr/bin/python3 ${APP_DIR}/app/transcriber.py" "multi-user.target"
-create_service_file "/etc/systemd/system/transcriber-worker.service" "Transcriber Worker Service" "/usr/bin/python3 ${APP_DIR}/app/worker.py" "multi-user.target"
-create_service_file "/etc/systemd/system/transcriber-web.service" "Transcriber Web Service (Flask)" "/usr/bin/python3 ${APP_DIR}/app/web_server.py" "network.target" "${APP_DIR}/app"
+create_service_file "/etc/systemd/system/transcriber-models.service" "Transcriber Model Server" "/usr/bin/python3 ${APP_DIR}/app/model_server.py" "multi-user.target"
+create_service_file "/etc/systemd/system/transcriber-worker.service" "Transcriber Worker Service" "/usr/bin/python3 ${APP_DIR}/app/worker.py" "transcriber-models.service" "" "transcriber-models.service"
+create_service_file "/etc/systemd/system/transcriber-web.service" "Transcriber Web Service (gunicorn)" "/usr/bin/python3 -m gunicorn --config ${APP_DIR}/app/gunicorn.conf.py web_server:app" "network.target" "${APP_DIR}/app"
 
 echo "Reloading systemd and enabling services..."
 sudo systemctl daemon-reload
-sudo systemctl enable transcriber-hw.service transcriber-worker.service transcriber-web.service
+sudo systemctl enable transcriber-hw.service transcriber-models.service transcriber-worker.service transcriber-web.service
 echo -e "${GREEN}>>> Step 7: Complete.${NC}"
 echo
 
@@ -320,7 +327,7 @@ sudo systemctl enable dnsmasq
 
 # --- 10. Final Restart of Services ---
 echo -e "${GREEN}>>> Step 10: Restarting all services with final configuration...${NC}"
-sudo systemctl restart transcriber-hw.service transcriber-worker.service transcriber-web.service nginx
+sudo systemctl restart transcriber-hw.service transcriber-models.service transcriber-worker.service transcriber-web.service nginx
 echo
 
 echo -e "${GREEN}>>> AP Setup Complete. Please reboot the Raspberry Pi to activate the Access Point.${NC}"
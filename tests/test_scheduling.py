@@ -0,0 +1,99 @@
+"""Checks that the worker's feeder takes jobs by priority while a long job is running."""
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+os.environ["TRANSCRIBER_MODEL_BACKEND"] = "fake"
+
+import meeting_index
+import job_status
+import scheduler
+import worker
+from pipeline import Pipeline, ctx
+
+STATE_TIMEOUT = 10  # Seconds to wait for a job to reach a state before failing
+
+def write_wav(path, seconds):
+    """Writes a silent WAV of the given length at a low rate, so long recordings stay small."""
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(100)
+        wf.writeframes(b"\0\0" * int(seconds * 100))
+
+class ClaimOrderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        meeting_index.DB_PATH = os.path.join(self.tmp, "meetings.db")
+        worker.TRANSCRIPTS_DIR = os.path.join(self.tmp, "transcripts")
+        worker.JOB_QUEUE_DIR = scheduler.JOB_QUEUE_DIR = os.path.join(self.tmp, "job_queue")
+        worker.IN_PROGRESS_DIR = os.path.join(worker.JOB_QUEUE_DIR, "in_progress")
+        os.makedirs(worker.IN_PROGRESS_DIR)
+        self.release = ctx.Event()  # Lets the first job's transcription finish
+        self.finished = ctx.Queue()
+        self.processes = []
+
+    def tearDown(self):
+        self.release.set()
+        for process in self.processes:
+            process.terminate()
+            process.join()
+        shutil.rmtree(self.tmp)
+
+    def decode(self, job):
+        job_status.set_state(job["meeting_id"], job_status.DECODING)
+        return job
+
+    def transcribe(self, job):
+        job_status.set_state(job["meeting_id"], job_status.TRANSCRIBING)
+        if job["meeting_id"] == "first":
+            self.release.wait()
+        return job
+
+    def finish(self, job):
+        worker.finish_job(job)
+        self.finished.put(job["meeting_id"])
+
+    def enqueue(self, meeting_id, seconds, source="upload"):
+        meeting_path = os.path.join(worker.TRANSCRIPTS_DIR, meeting_id)
+        os.makedirs(meeting_path)
+        write_wav(os.path.join(meeting_path, "audio.wav"), seconds)
+        with open(os.path.join(meeting_path, "metadata.json"), "w") as f:
+            json.dump({"name": meeting_id, "date": "2024-01-01", "audio_filename": "audio.wav"}, f)
+        scheduler.enqueue(meeting_id, os.path.join(meeting_path, "audio.wav"), source)
+
+    def wait_for_state(self, meeting_id, state):
+        deadline = time.monotonic() + STATE_TIMEOUT
+        while job_status.get_state(meeting_id) != state:
+            if time.monotonic() > deadline:
+                self.fail(f"{meeting_id} did not reach {state}")
+            time.sleep(0.01)
+
+    def test_short_recording_overtakes_queued_uploads(self):
+        pipeline = Pipeline([("decode", self.decode, 1), ("transcribe", self.transcribe, 1)],
+                            self.finish, worker.fail_job, admit_stages=2)
+        for _, target, args in [("feeder", worker.feed_pipeline, (pipeline,))] + pipeline.children():
+            process = ctx.Process(target=target, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+
+        self.enqueue("first", 3600)
+        self.wait_for_state("first", job_status.TRANSCRIBING)
+        self.enqueue("long-upload-1", 3600)
+        self.enqueue("long-upload-2", 3600)
+        self.enqueue("recording", 30, source="recorder")
+        self.release.set()
+
+        order = [self.finished.get(timeout=STATE_TIMEOUT) for _ in range(4)]
+        self.assertEqual(order, ["first", "recording", "long-upload-1", "long-upload-2"])
+        self.assertEqual(os.listdir(worker.IN_PROGRESS_DIR), [])
+
+if __name__ == "__main__":
+    unittest.main()